@@ -4,10 +4,12 @@ from __future__ import annotations
 # Inbound calls are handled via webhooks and LiveKit dispatching
 
 import asyncio
-import logging
-import json
+import functools
+import structlog
 import os
-from typing import Any, Optional
+import orjson
+from dataclasses import dataclass, fields
+from typing import Optional
 from dotenv import load_dotenv
 
 from livekit import rtc, api
@@ -15,12 +17,15 @@ from livekit.agents import (
     AgentSession,
     Agent,
     JobContext,
+    JobProcess,
     function_tool,
     RunContext,
     get_job_context,
     cli,
     WorkerOptions,
     RoomInputOptions,
+    ModelSettings,
+    llm,
 )
 from livekit.plugins import (
     deepgram,
@@ -33,33 +38,54 @@ from livekit.plugins import google
 from livekit.plugins.turn_detector.english import EnglishModel
 
 # Import our modular functions
+from agent_pidfile import write_pid_file
+from availability import get_available_times
+from canned_speech import say_canned, warm_canned
+from logging_config import configure_logging
+from faq_answers import FaqAnswers, load_faq, pending_utterance
 from make_outbound_call import make_outbound_call
 from inbound_calls import configure_inbound_calls
 
 # Load environment variables
 load_dotenv(dotenv_path=".env")
-logger = logging.getLogger("voice-agent")
-logger.setLevel(logging.INFO)
+configure_logging(stdlib=False)
+logger = structlog.get_logger("voice-agent")
 
 outbound_trunk_id = os.getenv("SIP_OUTBOUND_TRUNK_ID")
+# Prewarmed job processes kept ready for incoming calls, LiveKit's default when unset
+AGENT_IDLE_PROCESSES = os.getenv("AGENT_IDLE_PROCESSES")
 console_user = "+13613144340"
+DEFAULT_TRANSFER_TO = "+917204218098"
 
 
-class VoiceAgent(Agent):
-    """
-    A voice agent that can handle both inbound and outbound calls.
-    The agent adapts its behavior based on call type and context.
-    """
-    def __init__(
-        self,
-        *,
-        name: str = "Assistant",
-        call_type: str = "inbound",  # "inbound" or "outbound"
-        context_data: Optional[dict[str, Any]] = None,
-    ):
-        # Dynamic instructions based on call type
-        if call_type == "outbound":
-            instructions = f"""
+@dataclass(slots=True, frozen=True)
+class CallContext:
+    """Per-job call settings parsed from the dispatch metadata"""
+    phone_number: str = "unknown"
+    transfer_to: Optional[str] = None
+    call_type: str = "inbound"  # "inbound" or "outbound"
+
+
+_CALL_CONTEXT_FIELDS = frozenset(f.name for f in fields(CallContext))
+# Used when a job carries no (or unreadable) metadata
+_DEFAULT_CALL_CONTEXT = CallContext(transfer_to=DEFAULT_TRANSFER_TO)
+
+
+def parse_call_context(raw: Optional[str]) -> CallContext:
+    """Parse job metadata once into a CallContext, ignoring keys the agent doesn't use"""
+    if not raw:
+        logger.info("no_job_metadata", fallback="inbound")
+        return _DEFAULT_CALL_CONTEXT
+    try:
+        data = orjson.loads(raw)
+        return CallContext(**{k: v for k, v in data.items() if k in _CALL_CONTEXT_FIELDS})
+    except (orjson.JSONDecodeError, AttributeError, TypeError):
+        logger.warning("job_metadata_unparseable", fallback="inbound")
+        return _DEFAULT_CALL_CONTEXT
+
+
+# Instruction templates, specialized per call type and formatted with the agent name
+_OUTBOUND_TMPL = """
             You are {name}, a scheduling assistant for a dental practice and hospital reception. Your interface with user will be voice.
             You are making an OUTBOUND call to a patient who has an upcoming appointment. Your goal is to confirm the appointment details.
             Be polite and professional. Start by introducing yourself and the reason for your call.
@@ -67,83 +93,125 @@ class VoiceAgent(Agent):
             When the user would like to be transferred to a human agent, first confirm with them, then use the transfer_call tool.
             Ask the user their name and appointment details to confirm.
             """
-        else:  # inbound
-            instructions = f"""
+
+_INBOUND_TMPL = """
             You are {name}, a helpful assistant for a dental practice and hospital reception. Your interface with user will be voice.
             A patient is calling YOU (inbound call). Greet them warmly and ask how you can help them today.
             You can help with appointment scheduling, questions, and general support.
             
             When the user would like to be transferred to a human agent, first confirm with them, then use the transfer_call tool.
             """
+
+
+# Reviewed answers to general practice questions (see faq.example.json),
+# questions a tool answers or that depend on the caller don't belong in this file
+AGENT_FAQ_PATH = os.getenv("AGENT_FAQ_PATH", "faq.json")
+_faq = FaqAnswers(load_faq(AGENT_FAQ_PATH))
+
+
+@functools.lru_cache(maxsize=32)
+def build_instructions(call_type: str, name: str) -> str:
+    """Build the agent instructions for a call type, memoized per (call_type, name)"""
+    return (_OUTBOUND_TMPL if call_type == "outbound" else _INBOUND_TMPL).format(name=name)
+
+
+class VoiceAgent(Agent):
+    """
+    A voice agent that can handle both inbound and outbound calls.
+    The agent adapts its behavior based on call type and context.
+    """
+    def __init__(
+        self,
+        *,
+        name: str = "Assistant",
+        context: CallContext = _DEFAULT_CALL_CONTEXT,
+    ) -> None:
+        call_type = context.call_type
+        # Dynamic instructions based on call type
+        instructions = build_instructions(call_type, name)
         
         super().__init__(instructions=instructions)
         
         self.participant: Optional[rtc.Participant] = None
+        # Resolved once here and in set_participant so transfer_call does no per-call string work
+        self._transfer_uri: Optional[str] = f"tel:{context.transfer_to}" if context.transfer_to else None
+        self._p_identity: str = ""
         self.call_type = call_type
-        self.context_data = context_data or {}
+        self.context = context
         self.name = name
 
-    def set_participant(self, participant: rtc.Participant):
+    def set_participant(self, participant: rtc.Participant) -> None:
         """Set the participant for this agent session"""
         self.participant = participant
+        # In console mode the identity may be a MagicMock rather than a string
+        identity = participant.identity
+        self._p_identity = identity if isinstance(identity, str) else ""
 
     def get_transfer_number(self) -> Optional[str]:
-        """Get transfer number from context data"""
-        return self.context_data.get("transfer_to")
+        """Get transfer number from the call context"""
+        return self.context.transfer_to
 
-    async def hangup(self):
+    async def hangup(self) -> None:
         """Helper function to hang up the call by deleting the room"""
         job_ctx = get_job_context()
         await job_ctx.api.room.delete_room(
             api.DeleteRoomRequest(room=job_ctx.room.name)
         )
 
+    async def llm_node(
+        self,
+        chat_ctx: llm.ChatContext,
+        tools: list[llm.FunctionTool],
+        model_settings: ModelSettings,
+    ):
+        """Speak the reviewed answer to an FAQ question, otherwise stream from the LLM"""
+        # None on the pass that follows a tool call, that reply must reflect the tool's output
+        utterance = pending_utterance(chat_ctx.items)
+        answer = _faq.match(utterance) if utterance else None
+        if answer is not None:
+            logger.info("faq_answer_served", call_type=self.call_type)
+            yield answer
+            return
+
+        async for chunk in Agent.default.llm_node(self, chat_ctx, tools, model_settings):
+            yield chunk
+
     @function_tool()
-    async def transfer_call(self, ctx: RunContext):
+    async def transfer_call(self, ctx: RunContext) -> Optional[str]:
         """Transfer the call to a human agent, called after confirming with the user"""
         
         transfer_to = self.get_transfer_number()
-        if not transfer_to:
-            await ctx.session.generate_reply(
-                instructions="I don't have a number to transfer you to. Please contact support."
-            )
+        if self._transfer_uri is None:
+            await say_canned(ctx.session, "no_transfer_number")
             return "cannot transfer call, no transfer number configured"
 
         if self.participant is None:
-            logger.error("Transfer call error: participant is None.")
-            await ctx.session.generate_reply(
-                instructions="Sorry, I cannot transfer the call right now as participant details are missing."
-            )
+            logger.error("transfer_failed", reason="participant_missing")
+            await say_canned(ctx.session, "participant_missing")
             return "cannot transfer call, participant not available"
 
-        p_identity = self.participant.identity
+        p_identity = self._p_identity
 
-        # Check if participant_identity is a string. In console mode, it might be a MagicMock.
-        if not isinstance(p_identity, str):
+        # Empty when the participant identity was not a string (e.g. a console-mode mock)
+        if not p_identity:
             # If in console mode and identity is a mock
-            if self.context_data.get("phone_number") == "console_user":
-                logger.warning(
-                    f"Cannot perform real SIP transfer in console mode with mock participant identity: {p_identity}. Simulating transfer."
-                )
+            if self.context.phone_number == "console_user":
+                logger.warning("transfer_simulated", reason="console_mode", participant=repr(self.participant.identity))
                 await ctx.session.generate_reply(
                     instructions=f"I will simulate transferring you to {transfer_to} now. In a real call, you would be connected."
                 )
                 return "simulated transfer for console mode"
             else:
                 logger.error(
-                    f"Transfer call error: participant identity is not a string ('{type(p_identity)}'). Cannot transfer."
-                )
-                await ctx.session.generate_reply(
-                    instructions="Sorry, there was an unexpected issue with the participant information, and I can't transfer the call."
+                    "transfer_failed", reason="invalid_identity_type", identity_type=type(self.participant.identity).__name__
                 )
+                await say_canned(ctx.session, "invalid_identity")
                 return "cannot transfer call, invalid participant identity type"
 
-        logger.info(f"transferring call to {transfer_to} for participant {p_identity}")
+        logger.info("transferring_call", to=transfer_to, participant=p_identity)
 
         # Let the message play fully before transferring
-        await ctx.session.generate_reply(
-            instructions="Let the user know you'll be transferring them."
-        )
+        await say_canned(ctx.session, "transferring")
 
         job_ctx = get_job_context()
         try:
@@ -151,24 +219,22 @@ class VoiceAgent(Agent):
                 api.TransferSIPParticipantRequest(
                     room_name=job_ctx.room.name,
                     participant_identity=p_identity,
-                    transfer_to=f"tel:{transfer_to}",
+                    transfer_to=self._transfer_uri,
                 )
             )
-            logger.info(f"transferred call to {transfer_to}")
+            logger.info("call_transferred", to=transfer_to)
         except Exception as e:
-            logger.error(f"error transferring call: {e}")
-            await ctx.session.generate_reply(
-                instructions="There was an error transferring the call."
-            )
+            logger.error("transfer_failed", to=transfer_to, error=str(e))
+            await say_canned(ctx.session, "transfer_error")
             await self.hangup()  # Hang up if transfer fails
 
     @function_tool()
-    async def end_call(self, ctx: RunContext):
+    async def end_call(self, ctx: RunContext) -> None:
         """Called when the user wants to end the call"""
         if self.participant is None:
-            logger.info("Ending call, but participant was not set.")
+            logger.info("ending_call", participant=None)
         else:
-            logger.info(f"ending the call for {self.participant.identity}")
+            logger.info("ending_call", participant=self.participant.identity)
 
         # Let the agent finish speaking
         current_speech = ctx.session.current_speech
@@ -187,9 +253,8 @@ class VoiceAgent(Agent):
         participant_id_for_log = "unknown_participant"
         if self.participant:
             participant_id_for_log = self.participant.identity
-        logger.info(f"looking up availability for {participant_id_for_log} on {date}")
-        await asyncio.sleep(3)
-        return {"available_times": ["1pm", "2pm", "3pm"]}
+        logger.info("looking_up_availability", participant=participant_id_for_log, date=date)
+        return {"available_times": await get_available_times(date)}
 
     @function_tool()
     async def confirm_appointment(self, ctx: RunContext, date: str, time: str):
@@ -203,7 +268,7 @@ class VoiceAgent(Agent):
         participant_id_for_log = "unknown_participant"
         if self.participant:
             participant_id_for_log = self.participant.identity
-        logger.info(f"confirming appointment for {participant_id_for_log} on {date} at {time}")
+        logger.info("confirming_appointment", participant=participant_id_for_log, date=date, time=time)
         return "reservation confirmed"
 
     @function_tool()
@@ -212,55 +277,47 @@ class VoiceAgent(Agent):
         participant_id_for_log = "unknown_participant"
         if self.participant:
             participant_id_for_log = self.participant.identity
-        logger.info(f"detected answering machine for {participant_id_for_log}")
+        logger.info("answering_machine_detected", participant=participant_id_for_log)
         await self.hangup()
 
 
-async def entrypoint(ctx: JobContext):
+def prewarm(proc: JobProcess) -> None:
+    """
+    Load the VAD and turn-detector models once per worker process.
+    Every job handled by the process reuses them instead of reloading per call.
+    """
+    proc.userdata["vad"] = silero.VAD.load()
+    proc.userdata["turn"] = EnglishModel()
+
+
+async def entrypoint(ctx: JobContext) -> None:
     """
     Entry point for the LiveKit agent.
     Handles both inbound and outbound call contexts.
     """
-    logger.info(f"connecting to room {ctx.room.name}")
+    logger.info("connecting_to_room", room=ctx.room.name)
     await ctx.connect()
 
     # Parse metadata to determine call type and context
-    context_data: dict[str, Any] = {}
-    call_type = "inbound"  # Default to inbound
-    
-    if ctx.job.metadata:
-        try:
-            context_data = json.loads(ctx.job.metadata)
-            call_type = context_data.get("call_type", "inbound")
-        except json.JSONDecodeError:
-            logger.warning("Failed to parse job metadata. Using defaults for inbound call.")
-            context_data = {
-                "phone_number": "unknown",
-                "transfer_to": "+917204218098",
-                "call_type": "inbound"
-            }
-    else:
-        logger.info("No job metadata found. Defaulting to inbound call mode.")
-        context_data = {
-            "phone_number": "unknown", 
-            "transfer_to": "+917204218098",
-            "call_type": "inbound"
-        }
+    call_context = parse_call_context(ctx.job.metadata)
 
     # Create agent with appropriate configuration
     agent = VoiceAgent(
         name="Jayden",
-        call_type=call_type,
-        context_data=context_data,
+        context=call_context,
     )
 
     # Configure the session with AI models
     session = AgentSession(
-        turn_detection=EnglishModel(),
-        vad=silero.VAD.load(),
+        turn_detection=ctx.proc.userdata["turn"],
+        vad=ctx.proc.userdata["vad"],
         stt=deepgram.STT(),
-        tts=deepgram.TTS(),
-        llm=google.LLM(model="gemini-2.0-flash-lite")
+        # Deepgram TTS advertises streaming, so AgentSession drives it over the websocket
+        # stream and the first audio frame plays while the LLM is still emitting tokens
+        tts=deepgram.TTS(model="aura-asteria-en", encoding="linear16", sample_rate=24000),
+        llm=google.LLM(model="gemini-2.0-flash-lite"),
+        # Hand the turn off to the LLM sooner once the user stops speaking
+        min_endpointing_delay=0.4,
     )
 
     # Start the session
@@ -275,13 +332,14 @@ async def entrypoint(ctx: JobContext):
     )
 
     # Handle outbound calls - only create SIP participant if this is an outbound call
-    phone_number = context_data.get("phone_number", "unknown")
+    call_type = call_context.call_type
+    phone_number = call_context.phone_number
     participant_identity = phone_number
     
     try:
         if call_type == "outbound" and phone_number != "console_user" and phone_number != "unknown":
             # This is an explicit outbound call request
-            logger.info(f"Making outbound call to {phone_number}")
+            logger.info("making_outbound_call", to=phone_number)
             await ctx.api.sip.create_sip_participant(
                 api.CreateSIPParticipantRequest(
                     room_name=ctx.room.name,
@@ -293,60 +351,76 @@ async def entrypoint(ctx: JobContext):
             )
         elif phone_number == "console_user":
             # Console mode for testing
-            logger.info("Console mode detected")
+            logger.info("console_mode_detected")
         else:
             # Inbound call - participant will join automatically
-            logger.info("Waiting for inbound call participant to join")
+            logger.info("waiting_for_inbound_participant")
 
         # Wait for session to start
         await session_started
+        # Pre-synthesize the fixed transfer/error phrases while the call gets going
+        warm_canned(session)
         
         # Set the participant once connected
         if phone_number == "console_user":
-            logger.info("Console mode: Setting agent participant to local participant.")
+            logger.info("console_mode_using_local_participant")
             if ctx.room and ctx.room.local_participant:
                 agent.set_participant(ctx.room.local_participant)
-                logger.info(f"Agent participant set for console mode.")
+                logger.info("participant_set", mode="console")
             else:
-                logger.warning("Console mode: local_participant not found.")
+                logger.warning("console_mode_local_participant_missing")
         else:
             # Wait for the participant to join (either inbound caller or outbound callee)
             participant = await ctx.wait_for_participant(identity=participant_identity)
-            logger.info(f"participant joined: {participant.identity}")
+            logger.info("participant_joined", participant=participant.identity)
             agent.set_participant(participant)
 
     except api.TwirpError as e:
         logger.error(
-            f"error with SIP participant: {e.message}, "
-            f"SIP status: {e.metadata.get('sip_status_code')} "
-            f"{e.metadata.get('sip_status')}"
+            "sip_participant_error",
+            error=e.message,
+            sip_status_code=e.metadata.get("sip_status_code"),
+            sip_status=e.metadata.get("sip_status"),
         )
         ctx.shutdown()
 
 
 # Function to explicitly make an outbound call (can be called from external scripts)
-async def make_explicit_outbound_call(phone_number: str, transfer_to: str = "+917204218098"):
+async def make_explicit_outbound_call(phone_number: str, transfer_to: str = DEFAULT_TRANSFER_TO):
     """
     Function to explicitly make an outbound call.
     This should be called from external scripts or APIs, not automatically.
     """
     from livekit.agents import JobRequest
     
-    metadata = json.dumps({
+    metadata = orjson.dumps({
         "call_type": "outbound",
         "phone_number": phone_number,
         "transfer_to": transfer_to
-    })
+    }).decode()
     
     # This would typically be called by LiveKit's job dispatcher
-    logger.info(f"Requesting outbound call to {phone_number}")
+    logger.info("outbound_call_requested", to=phone_number)
     return metadata
 
 
 if __name__ == "__main__":
-    cli.run_app(
-        WorkerOptions(
-            entrypoint_fnc=entrypoint,
-            agent_name="voice-agent",
-        )
-    )
\ No newline at end of file
+    write_pid_file()
+
+    # libuv-backed event loop where available (not on Windows)
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        logger.info("uvloop_unavailable", loop="asyncio")
+
+    # Each job already runs in its own process; this only sizes the warm pool
+    options = WorkerOptions(
+        entrypoint_fnc=entrypoint,
+        prewarm_fnc=prewarm,
+        agent_name="voice-agent",
+    )
+    if AGENT_IDLE_PROCESSES:
+        options.num_idle_processes = int(AGENT_IDLE_PROCESSES)
+
+    cli.run_app(options)
\ No newline at end of file
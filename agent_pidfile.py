@@ -0,0 +1,45 @@
+"""
+PID file written by the running voice agent, so status checks can probe the
+process directly instead of scanning the process table.
+"""
+
+import atexit
+import os
+from typing import Optional
+
+PID_FILE = os.getenv("VOICE_AGENT_PID_FILE", "/tmp/voice-agent.pid")
+
+
+def _remove(path: str, pid: int):
+    # Only remove the file if it still belongs to this process
+    try:
+        with open(path) as f:
+            if int(f.read().strip()) == pid:
+                os.remove(path)
+    except (OSError, ValueError):
+        pass
+
+
+def write_pid_file(path: str = PID_FILE):
+    """Record this process's PID and remove the file again on exit"""
+    pid = os.getpid()
+    with open(path, "w") as f:
+        f.write(str(pid))
+    atexit.register(_remove, path, pid)
+
+
+def agent_alive(path: str = PID_FILE) -> Optional[bool]:
+    """True/False from the PID file, or None if there is no usable PID file"""
+    try:
+        with open(path) as f:
+            pid = int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, but owned by another user
+        return True
+    return True
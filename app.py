@@ -4,43 +4,45 @@ Provides REST endpoints for triggering outbound calls and handling inbound call
 """
 
 from fastapi import FastAPI, HTTPException, Request, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
 from pydantic import BaseModel
 import json
-import logging
+import structlog
+import orjson
 import os
+import uuid
+from dataclasses import asdict
 from typing import Optional, Dict, Any
 import asyncio
 from dotenv import load_dotenv
 
 # Import our call functions
-from make_outbound_call import make_outbound_call
-from inbound_calls import configure_inbound_calls
-from support_assistant import create_support_assistant
-
-# Import for LiveKit agent dispatch
-from livekit import api, rtc
+from config import (
+    VAPI_TOKEN,
+    ASSISTANT_ID,
+    PHONE_NUMBER_ID,
+    LIVEKIT_API_KEY,
+    LIVEKIT_API_SECRET,
+)
+from call_store import CallEventWriter, CallRecord, get_call_store
+from logging_config import configure_logging
+import vapi_client
+from make_outbound_call import make_outbound_call_async
+from inbound_calls import aconfigure_inbound_calls
 
 load_dotenv()
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+configure_logging()
+logger = structlog.get_logger(__name__)
 
 app = FastAPI(
     title="Voice Agent API",
     description="API for managing inbound and outbound voice calls with AI agents",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
-# Environment variables
-VAPI_TOKEN = os.getenv("VAPI_TOKEN")
-ASSISTANT_ID = os.getenv("ASSISTANT_ID")
-PHONE_NUMBER_ID = os.getenv("PHONE_NUMBER_ID")
-LIVEKIT_API_KEY = os.getenv("LIVEKIT_API_KEY")
-LIVEKIT_API_SECRET = os.getenv("LIVEKIT_API_SECRET")
-LIVEKIT_URL = os.getenv("LIVEKIT_URL")
-
 # Pydantic models for API requests
 class OutboundCallRequest(BaseModel):
     phone_number: str
@@ -60,8 +62,20 @@ class CallStatusResponse(BaseModel):
     call_id: Optional[str] = None
     details: Optional[Dict[str, Any]] = None
 
-# Global call tracking
-active_calls: Dict[str, Dict[str, Any]] = {}
+# Global call tracking, in-process or Redis-backed depending on REDIS_URL
+call_store = get_call_store()
+# Webhook writes are queued and applied in the background
+call_events = CallEventWriter(call_store)
+
+@app.on_event("startup")
+async def start_background_writers():
+    call_events.start()
+
+@app.on_event("shutdown")
+async def close_clients():
+    await call_events.aclose()
+    await call_store.aclose()
+    await vapi_client.aclose()
 
 @app.get("/")
 async def root():
@@ -69,7 +83,7 @@ async def root():
     return {
         "message": "Voice Agent API is running",
         "status": "healthy",
-        "active_calls": len(active_calls)
+        "active_calls": await call_store.count_active()
     }
 
 @app.get("/health")
@@ -82,17 +96,34 @@ async def health_check():
             "livekit": "configured" if LIVEKIT_API_KEY else "missing_credentials",
             "assistant": "configured" if ASSISTANT_ID else "missing_id"
         },
-        "active_calls": len(active_calls)
+        "active_calls": await call_store.count_active()
     }
 
-@app.post("/calls/outbound", response_model=CallStatusResponse)
+async def _dispatch_vapi(call_id: str, assistant_id: str, phone_number: str, call_metadata: Dict[str, Any]):
+    """Place the Vapi call for a queued outbound request and record the outcome"""
+    try:
+        # Our call_id rides along in the Vapi metadata so webhooks can be correlated
+        vapi_call = await make_outbound_call_async(
+            assistant_id, phone_number, {**call_metadata, "call_id": call_id}
+        )
+        vapi_call_id = vapi_call.id if hasattr(vapi_call, 'id') else None
+        await call_store.update(call_id, vapi_call_id=vapi_call_id)
+        # A call.started webhook may already have been applied, don't move the status back
+        await call_store.update(call_id, if_status="queued", status="initiated")
+        logger.info("outbound_call_initiated", call_id=call_id, vapi_call_id=vapi_call_id)
+    except Exception as e:
+        logger.error("outbound_call_failed", call_id=call_id, error=str(e))
+        if await call_store.update(call_id, status="failed", error=str(e)):
+            await call_store.finish(call_id)
+
+@app.post("/calls/outbound", response_model=CallStatusResponse, status_code=202)
 async def make_outbound_call_endpoint(
     request: OutboundCallRequest,
     background_tasks: BackgroundTasks
 ):
     """
-    Trigger an outbound call to a specific phone number.
-    This uses both Vapi for call initiation and LiveKit for agent dispatch.
+    Queue an outbound call to a specific phone number.
+    The Vapi call is placed in the background; poll /calls/{call_id} for its status.
     """
     try:
         # Use the assistant ID from request or default
@@ -101,128 +132,171 @@ async def make_outbound_call_endpoint(
         if not assistant_id:
             raise HTTPException(status_code=400, detail="Assistant ID is required")
         
-        logger.info(f"Initiating outbound call to {request.phone_number}")
-        
-        # Method 1: Use Vapi for call initiation
-        vapi_call = make_outbound_call(assistant_id, request.phone_number)
+        call_id = str(uuid.uuid4())
+        logger.info("outbound_call_queued", call_id=call_id, to=request.phone_number)
         
-        # Method 2: Also prepare LiveKit agent dispatch metadata
+        # LiveKit agent dispatch metadata, also attached to the Vapi call
         # This allows the LiveKit agent to handle the call with proper context
         call_metadata = {
             "call_type": "outbound",
             "phone_number": request.phone_number,
             "transfer_to": request.transfer_to,
-            "vapi_call_id": vapi_call.id if hasattr(vapi_call, 'id') else None,
             "context": request.call_context or {}
         }
         
         # Store call information
-        call_id = vapi_call.id if hasattr(vapi_call, 'id') else f"outbound_{len(active_calls)}"
-        active_calls[call_id] = {
-            "type": "outbound",
-            "phone_number": request.phone_number,
-            "status": "initiated",
-            "metadata": call_metadata,
-            "vapi_call": vapi_call
-        }
+        await call_store.create(call_id, CallRecord(
+            type="outbound",
+            phone_number=request.phone_number,
+            status="queued",
+        ))
         
-        logger.info(f"Outbound call initiated successfully: {call_id}")
+        background_tasks.add_task(
+            _dispatch_vapi, call_id, assistant_id, request.phone_number, call_metadata
+        )
         
         return CallStatusResponse(
             success=True,
-            message=f"Outbound call initiated to {request.phone_number}",
+            message=f"Outbound call to {request.phone_number} queued",
             call_id=call_id,
             details=call_metadata
         )
         
     except Exception as e:
-        logger.error(f"Error making outbound call: {str(e)}")
+        logger.error("outbound_call_queue_failed", error=str(e))
         raise HTTPException(status_code=500, detail=f"Failed to initiate call: {str(e)}")
 
+# Webhook event type -> (log level, event name) for the call lifecycle events we log
+_LIFECYCLE_LOGS = {
+    "call.started": ("info", "inbound_call_started"),
+    "call.ended": ("info", "inbound_call_ended"),
+    "call.failed": ("warning", "inbound_call_failed"),
+}
+# Events after which a call leaves the active set
+_TERMINAL_EVENTS = frozenset({"call.ended", "call.failed"})
+# Constant acknowledgement bodies, encoded once rather than per webhook
+_ACK_PROCESSED = orjson.dumps({"success": True, "message": "Webhook processed successfully"})
+_ACK_IGNORED = orjson.dumps({"success": True, "message": "Webhook ignored"})
+_ACK_NO_CALL_ID = orjson.dumps({"success": True, "message": "Webhook has no call id"})
+# Largest webhook body accepted, end-of-call reports with transcripts stay well below this
+MAX_WEBHOOK_BYTES = int(os.getenv("MAX_WEBHOOK_BYTES", str(1024 * 1024)))
+
+async def _read_webhook_body(request: Request) -> bytes:
+    """Request body, rejecting anything over MAX_WEBHOOK_BYTES before it is buffered or parsed"""
+    declared = request.headers.get("content-length")
+    if declared is not None and declared.isdigit() and int(declared) > MAX_WEBHOOK_BYTES:
+        raise HTTPException(status_code=413, detail="Webhook payload too large")
+    # Chunked bodies carry no length, so count while reading
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > MAX_WEBHOOK_BYTES:
+            raise HTTPException(status_code=413, detail="Webhook payload too large")
+    return bytes(body)
+
+def _webhook_call_fields(payload: Dict[str, Any]) -> tuple[Optional[str], str, bool]:
+    """
+    Call id (ours for outbound calls placed by this API, else Vapi's, else None),
+    customer number, and whether the call was placed by this API
+    """
+    call = payload.get("call") or {}
+    # Webhooks follow a fixed schema, so index directly and fall back only when a field is absent
+    try:
+        our_id = call["metadata"]["call_id"]
+    except (KeyError, TypeError):
+        our_id = None
+    call_id = our_id or call.get("id")
+    try:
+        phone_number = call["customer"]["number"]
+    except (KeyError, TypeError):
+        phone_number = "unknown"
+    return call_id, phone_number, bool(our_id)
+
 @app.post("/webhooks/inbound")
 async def handle_inbound_webhook(request: Request):
     """
     Webhook endpoint for handling inbound call events from Vapi.
     This is called when someone calls your Vapi phone number.
     """
+    body = await _read_webhook_body(request)
     try:
-        # Parse the webhook payload
-        payload = await request.json()
-        logger.info(f"Received inbound webhook: {payload}")
+        # Parse the webhook payload (orjson keeps this cheap under webhook bursts)
+        payload = orjson.loads(body)
         
-        # Extract call information
-        call_id = payload.get("call", {}).get("id", "unknown")
-        phone_number = payload.get("call", {}).get("customer", {}).get("number", "unknown")
         status = payload.get("type", "unknown")  # e.g., "call.started", "call.ended"
+        # Handle different webhook events, a single lookup instead of an if/elif chain
+        lifecycle = _LIFECYCLE_LOGS.get(status)
+        if lifecycle is None:
+            # Not a call lifecycle event, acknowledge without touching call state
+            logger.debug("webhook_ignored", type=status)
+            return Response(_ACK_IGNORED, media_type="application/json")
         
-        # Store/update call information
-        if call_id not in active_calls:
-            active_calls[call_id] = {
-                "type": "inbound",
-                "phone_number": phone_number,
-                "status": status,
-                "metadata": payload,
-                "webhook_data": payload
-            }
-        else:
-            active_calls[call_id]["status"] = status
-            active_calls[call_id]["webhook_data"] = payload
+        # Extract call information, outbound calls placed by this API carry our own call_id
+        call_id, phone_number, placed_by_us = _webhook_call_fields(payload)
+        if not call_id:
+            # Malformed or preview events, keyed state would all pile up under one id
+            logger.warning("webhook_missing_call_id", type=status)
+            return Response(_ACK_NO_CALL_ID, media_type="application/json")
+        # Only the extracted fields at INFO, serializing the whole payload is left to debug runs
+        logger.info("webhook_received", type=status, call_id=call_id)
+        logger.debug("webhook_payload", call_id=call_id, payload=payload)
         
-        # Handle different webhook events
-        if status == "call.started":
-            logger.info(f"Inbound call started from {phone_number}")
-            # Here you could trigger additional LiveKit agent dispatch if needed
-            
-        elif status == "call.ended":
-            logger.info(f"Inbound call ended from {phone_number}")
-            # Clean up or log final call data
-            
-        elif status == "call.failed":
-            logger.warning(f"Inbound call failed from {phone_number}")
+        # Store/update call information, terminal events move the call out of the active set.
+        # Only the start of an inbound call creates a record; outbound records come from the API,
+        # so a late event for a deleted outbound call doesn't bring it back as inbound
+        await call_events.emit(
+            call_id, phone_number, status, payload,
+            terminal=status in _TERMINAL_EVENTS,
+            create=status == "call.started" and not placed_by_us,
+        )
+        
+        level, event = lifecycle
+        getattr(logger, level)(event, call_id=call_id, phone_number=phone_number)
             
         # Return success response to Vapi
-        return {"success": True, "message": "Webhook processed successfully"}
+        return Response(_ACK_PROCESSED, media_type="application/json")
         
     except Exception as e:
-        logger.error(f"Error processing inbound webhook: {str(e)}")
+        logger.error("webhook_processing_failed", error=str(e))
         raise HTTPException(status_code=500, detail="Failed to process webhook")
 
 @app.get("/calls/active")
 async def get_active_calls():
     """Get list of currently active calls"""
+    calls = await call_store.list_active()
     return {
-        "active_calls": active_calls,
-        "count": len(active_calls)
+        "active_calls": calls,
+        "count": len(calls)
     }
 
 @app.get("/calls/{call_id}")
 async def get_call_status(call_id: str):
     """Get status of a specific call"""
-    if call_id not in active_calls:
+    record = await call_store.get(call_id)
+    if record is None:
         raise HTTPException(status_code=404, detail="Call not found")
     
-    return active_calls[call_id]
+    return {**asdict(record), "webhook_data": await call_store.get_payload(call_id)}
 
 @app.delete("/calls/{call_id}")
 async def end_call(call_id: str):
     """End a specific call"""
-    if call_id not in active_calls:
-        raise HTTPException(status_code=404, detail="Call not found")
-    
     try:
         # Here you would implement call termination logic
         # This might involve calling Vapi API to end the call
-        call_info = active_calls[call_id]
-        logger.info(f"Ending call {call_id}")
+        logger.info("ending_call", call_id=call_id)
         
         # Remove from active calls
-        del active_calls[call_id]
-        
-        return {"success": True, "message": f"Call {call_id} ended successfully"}
+        removed = await call_store.delete(call_id)
         
     except Exception as e:
-        logger.error(f"Error ending call {call_id}: {str(e)}")
+        logger.error("end_call_failed", call_id=call_id, error=str(e))
         raise HTTPException(status_code=500, detail=f"Failed to end call: {str(e)}")
+    
+    if not removed:
+        raise HTTPException(status_code=404, detail="Call not found")
+    
+    return {"success": True, "message": f"Call {call_id} ended successfully"}
 
 @app.post("/calls/configure-inbound")
 async def configure_inbound_endpoint():
@@ -234,7 +308,7 @@ async def configure_inbound_endpoint():
                 detail="Phone number ID and Assistant ID are required"
             )
         
-        result = configure_inbound_calls(PHONE_NUMBER_ID, ASSISTANT_ID)
+        result = await aconfigure_inbound_calls(PHONE_NUMBER_ID, ASSISTANT_ID)
         
         return {
             "success": True,
@@ -245,7 +319,7 @@ async def configure_inbound_endpoint():
         }
         
     except Exception as e:
-        logger.error(f"Error configuring inbound calls: {str(e)}")
+        logger.error("configure_inbound_failed", error=str(e))
         raise HTTPException(status_code=500, detail=f"Failed to configure: {str(e)}")
 
 # Additional utility endpoints
@@ -254,14 +328,15 @@ async def configure_inbound_endpoint():
 async def create_assistant_endpoint():
     """Create a new assistant (wrapper for support_assistant)"""
     try:
-        assistant = create_support_assistant()
+        from support_assistant import acreate_support_assistant
+        assistant = await acreate_support_assistant()
         return {
             "success": True,
             "message": "Assistant created successfully",
             "assistant": assistant
         }
     except Exception as e:
-        logger.error(f"Error creating assistant: {str(e)}")
+        logger.error("assistant_create_failed", error=str(e))
         raise HTTPException(status_code=500, detail=f"Failed to create assistant: {str(e)}")
 
 @app.get("/config")
@@ -278,11 +353,14 @@ async def get_configuration():
 if __name__ == "__main__":
     import uvicorn
     
-    # Run the FastAPI app
+    # Run the FastAPI app; reload is for local development only (DEV=1).
+    # Without REDIS_URL call state lives in this process, so keep a single
+    # worker (the default) unless state is shared through Redis.
     uvicorn.run(
         "app:app", 
         host="0.0.0.0", 
         port=8000, 
-        reload=True,
+        reload=os.getenv("DEV") == "1",
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
         log_level="info"
     )
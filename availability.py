@@ -0,0 +1,82 @@
+"""
+Appointment availability lookups for the agent's look_up_availability tool.
+Slots are fetched a week at a time and cached briefly, so asking about several
+days of the same week costs a single backend query.
+"""
+
+import asyncio
+import datetime
+import time
+from typing import Optional
+
+# Seconds a fetched week stays fresh
+SLOT_TTL = 60.0
+MAX_CACHED_WEEKS = 1024
+
+# week key -> (fetched_at, task resolving to {day key: [times]})
+_week_cache: dict[str, tuple[float, asyncio.Task]] = {}
+
+
+def _parse_day(date: str) -> Optional[datetime.date]:
+    try:
+        return datetime.date.fromisoformat(date.strip())
+    except ValueError:
+        return None
+
+
+def day_key(date: str) -> str:
+    """ISO date for YYYY-MM-DD input, otherwise the normalized raw text"""
+    day = _parse_day(date)
+    return day.isoformat() if day else date.strip().lower()
+
+
+def week_of(date: str) -> str:
+    """Monday of the week for an ISO date; other phrasings ("next tuesday") key on their own"""
+    day = _parse_day(date)
+    if day is None:
+        return day_key(date)
+    return (day - datetime.timedelta(days=day.weekday())).isoformat()
+
+
+async def _fetch_week(week: str) -> dict[str, list[str]]:
+    """Query the scheduling backend for every open slot in a week (placeholder)"""
+    await asyncio.sleep(3)
+    start = _parse_day(week)
+    if start is None:
+        return {week: ["1pm", "2pm", "3pm"]}
+    return {
+        (start + datetime.timedelta(days=offset)).isoformat(): ["1pm", "2pm", "3pm"]
+        for offset in range(7)
+    }
+
+
+def _week_task(week: str) -> asyncio.Task:
+    now = time.monotonic()
+    entry = _week_cache.get(week)
+    if entry is not None and now - entry[0] < SLOT_TTL:
+        return entry[1]
+
+    if len(_week_cache) >= MAX_CACHED_WEEKS:
+        for key in [k for k, (fetched_at, _) in _week_cache.items() if now - fetched_at >= SLOT_TTL]:
+            del _week_cache[key]
+        while len(_week_cache) >= MAX_CACHED_WEEKS:
+            del _week_cache[next(iter(_week_cache))]
+
+    # Concurrent lookups for the same week share one in-flight query
+    task = asyncio.ensure_future(_fetch_week(week))
+    _week_cache[week] = (now, task)
+    return task
+
+
+async def get_available_times(date: str) -> list[str]:
+    """Open appointment times on a date, served from the cached week when possible"""
+    week = week_of(date)
+    task = _week_task(week)
+    try:
+        slots = await asyncio.shield(task)
+    except Exception:
+        # Don't cache backend failures
+        if _week_cache.get(week, (None, None))[1] is task:
+            del _week_cache[week]
+        raise
+    return slots.get(day_key(date), [])
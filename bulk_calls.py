@@ -1,29 +1,45 @@
-from vapi import Vapi
 import os
+import asyncio
+from aiolimiter import AsyncLimiter
 from dotenv import load_dotenv
-from support_assistant import create_support_assistant
-import time
+from vapi_client import call_with_backoff, get_async_client
 load_dotenv()
-client = Vapi(token=os.getenv("VAPI_TOKEN"))
 
-def run_bulk_call_campaign(assistant_id: str, phone_number_id: str):
+# Upper bound on calls in flight at once, keep this at or below the Vapi concurrency quota
+MAX_CONCURRENT_CALLS = int(os.getenv("VAPI_MAX_CONCURRENT_CALLS", "10"))
+# Sustained request rate, bursts up to this many requests per second are allowed
+CALLS_PER_SECOND = float(os.getenv("VAPI_CALLS_PER_SECOND", "10"))
+
+limiter = AsyncLimiter(max_rate=CALLS_PER_SECOND, time_period=1)
+
+
+async def create_call_with_backoff(**call_params):
+    """Create a Vapi call under the rate limiter, backing off and retrying on 429"""
+    return await call_with_backoff(get_async_client().calls.create, limiter=limiter, **call_params)
+
+
+async def run_bulk_call_campaign(assistant_id: str, phone_number_id: str):
+    """
+    Dial every prospect, returning a Call object or the exception raised for
+    each one in prospect order, so one failure doesn't hide the calls already placed
+    """
     prospects = [
         {"number": "+1234567890", "name": "John Smith"},
         {"number": "+1234567891", "name": "Jane Doe"},
         # ... more prospects
     ]
 
-    calls = []
-    for prospect in prospects:
-        call = vapi.calls.create(
-            assistant_id=assistant_id,
-            phone_number_id=phone_number_id,
-            customer=prospect,
-            metadata={"campaign": "Q1_Sales"}
-        )
-        calls.append(call)
+    sem = asyncio.Semaphore(MAX_CONCURRENT_CALLS)
+
+    async def dial(prospect):
+        async with sem:
+            return await create_call_with_backoff(
+                assistant_id=assistant_id,
+                phone_number_id=phone_number_id,
+                customer=prospect,
+                metadata={"campaign": "Q1_Sales"},
+            )
 
-        # Rate limiting
-        time.sleep(2)
+    calls = await asyncio.gather(*(dial(p) for p in prospects), return_exceptions=True)
 
-    return calls
+    return list(calls)
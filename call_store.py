@@ -0,0 +1,319 @@
+"""
+Call state storage for the API.
+MemoryCallStore keeps everything in this process; RedisCallStore shares state
+across uvicorn workers and API instances. get_call_store() picks one based on REDIS_URL.
+"""
+
+import asyncio
+import os
+import time
+from dataclasses import asdict, dataclass, field, fields
+from typing import Any, Dict, Optional
+
+import orjson
+import structlog
+from cachetools import TTLCache
+
+logger = structlog.get_logger(__name__)
+
+# Active calls age out if no terminal webhook ever arrives
+ACTIVE_TTL = 3600
+# Ended/failed calls stay visible briefly for observability before eviction
+ENDED_TTL = 300
+MAX_ACTIVE_CALLS = 10_000
+
+
+@dataclass(slots=True)
+class CallRecord:
+    """Compact per-call state, the only thing /calls/active serializes"""
+    type: str
+    phone_number: str
+    status: str
+    vapi_call_id: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    error: Optional[str] = None
+
+
+_RECORD_FIELDS = frozenset(f.name for f in fields(CallRecord))
+
+
+class MemoryCallStore:
+    """In-process store, only consistent within a single worker"""
+
+    def __init__(self):
+        self._active: TTLCache = TTLCache(maxsize=MAX_ACTIVE_CALLS, ttl=ACTIVE_TTL)
+        self._ended: TTLCache = TTLCache(maxsize=1_000, ttl=ENDED_TTL)
+        # Heavy webhook payloads, kept apart from the records
+        self._payloads: TTLCache = TTLCache(maxsize=MAX_ACTIVE_CALLS, ttl=ACTIVE_TTL)
+        # Serializes mutations from concurrent webhooks and requests
+        self._lock = asyncio.Lock()
+
+    async def create(self, call_id: str, record: CallRecord):
+        async with self._lock:
+            self._active[call_id] = record
+
+    async def update(self, call_id: str, *, if_status: Optional[str] = None, **changes: Any) -> bool:
+        """Apply changes to an active call; with if_status, only while its status still equals it"""
+        async with self._lock:
+            record = self._active.get(call_id)
+            if record is None or (if_status is not None and record.status != if_status):
+                return False
+            for name, value in changes.items():
+                setattr(record, name, value)
+            return True
+
+    async def record_webhook(
+        self, call_id: str, phone_number: str, status: str, payload: Dict[str, Any], *, create: bool = False
+    ) -> bool:
+        """
+        Apply a webhook to an active call. An unknown call is only recorded (as inbound)
+        when create is set; ended or deleted calls are never brought back.
+        """
+        async with self._lock:
+            record = self._active.get(call_id)
+            if record is None:
+                if not create or call_id in self._ended:
+                    return False
+                self._active[call_id] = CallRecord(type="inbound", phone_number=phone_number, status=status)
+            else:
+                record.status = status
+            self._payloads[call_id] = payload
+            return True
+
+    async def finish(self, call_id: str):
+        """Move a call out of the active set"""
+        async with self._lock:
+            record = self._active.pop(call_id, None)
+            if record is not None:
+                self._ended[call_id] = record
+
+    async def get(self, call_id: str) -> Optional[CallRecord]:
+        return self._active.get(call_id) or self._ended.get(call_id)
+
+    async def get_payload(self, call_id: str) -> Optional[Dict[str, Any]]:
+        return self._payloads.get(call_id)
+
+    async def list_active(self) -> Dict[str, CallRecord]:
+        return dict(self._active)
+
+    async def count_active(self) -> int:
+        return len(self._active)
+
+    async def delete(self, call_id: str) -> bool:
+        """Remove a call, active or recently ended, and its payload"""
+        async with self._lock:
+            removed = [cache.pop(call_id, None) for cache in (self._active, self._ended, self._payloads)]
+            return any(item is not None for item in removed)
+
+    async def aclose(self):
+        pass
+
+
+# Check-and-write for RedisCallStore.update in one atomic step, so a hash that
+# expires or leaves the active set mid-update is never recreated without a TTL.
+# KEYS: call hash, active set. ARGV: call id, TTL, encoded expected status or "", now, field/value pairs
+_UPDATE_SCRIPT = """
+if not redis.call('ZSCORE', KEYS[2], ARGV[1]) or redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+if ARGV[3] ~= '' and redis.call('HGET', KEYS[1], 'status') ~= ARGV[3] then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 5))
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('ZADD', KEYS[2], ARGV[4], ARGV[1])
+return 1
+"""
+
+# Webhook write for RedisCallStore.record_webhook, atomic for the same reason.
+# An ended call's hash lingers for ENDED_TTL outside the active set and is left alone.
+# KEYS: call hash, active set, payload key.
+# ARGV: call id, now, TTL, status, phone number, created_at, payload, create ("1"/"0"), type
+_RECORD_WEBHOOK_SCRIPT = """
+local exists = redis.call('EXISTS', KEYS[1]) == 1
+if not (exists and redis.call('ZSCORE', KEYS[2], ARGV[1])) then
+    if exists or ARGV[8] ~= '1' then
+        return 0
+    end
+    redis.call('HSET', KEYS[1], 'type', ARGV[9], 'phone_number', ARGV[5], 'created_at', ARGV[6])
+end
+redis.call('HSET', KEYS[1], 'status', ARGV[4])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+redis.call('SET', KEYS[3], ARGV[7], 'EX', ARGV[3])
+return 1
+"""
+
+
+class RedisCallStore:
+    """
+    Redis-backed store: one hash per call (values orjson-encoded), a sorted set
+    of active call ids scored by last activity, and a separate payload key.
+    """
+
+    _ACTIVE_SET = "calls:active"
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._update = self._redis.register_script(_UPDATE_SCRIPT)
+        self._record_webhook = self._redis.register_script(_RECORD_WEBHOOK_SCRIPT)
+
+    @staticmethod
+    def _key(call_id: str) -> str:
+        return f"call:{call_id}"
+
+    @staticmethod
+    def _payload_key(call_id: str) -> str:
+        return f"call:{call_id}:payload"
+
+    @staticmethod
+    def _encode(values: Dict[str, Any]) -> Dict[str, bytes]:
+        return {name: orjson.dumps(value) for name, value in values.items()}
+
+    @staticmethod
+    def _decode(raw: Dict[bytes, bytes]) -> Optional[CallRecord]:
+        if not raw:
+            return None
+        values = {k.decode(): orjson.loads(v) for k, v in raw.items()}
+        return CallRecord(**{k: v for k, v in values.items() if k in _RECORD_FIELDS})
+
+    async def create(self, call_id: str, record: CallRecord):
+        key = self._key(call_id)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping=self._encode(asdict(record)))
+            pipe.expire(key, ACTIVE_TTL)
+            pipe.zadd(self._ACTIVE_SET, {call_id: time.time()})
+            await pipe.execute()
+
+    async def update(self, call_id: str, *, if_status: Optional[str] = None, **changes: Any) -> bool:
+        """Apply changes to an active call; with if_status, only while its status still equals it"""
+        args = [call_id, ACTIVE_TTL, orjson.dumps(if_status) if if_status is not None else b"", time.time()]
+        for name, value in self._encode(changes).items():
+            args += (name, value)
+        return bool(await self._update(keys=[self._key(call_id), self._ACTIVE_SET], args=args))
+
+    async def record_webhook(
+        self, call_id: str, phone_number: str, status: str, payload: Dict[str, Any], *, create: bool = False
+    ) -> bool:
+        """
+        Apply a webhook to an active call. An unknown call is only recorded (as inbound)
+        when create is set; ended or deleted calls are never brought back.
+        """
+        now = time.time()
+        args = [
+            call_id, now, ACTIVE_TTL, orjson.dumps(status), orjson.dumps(phone_number),
+            orjson.dumps(now), orjson.dumps(payload), "1" if create else "0", orjson.dumps("inbound"),
+        ]
+        keys = [self._key(call_id), self._ACTIVE_SET, self._payload_key(call_id)]
+        return bool(await self._record_webhook(keys=keys, args=args))
+
+    async def finish(self, call_id: str):
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(self._ACTIVE_SET, call_id)
+            pipe.expire(self._key(call_id), ENDED_TTL)
+            pipe.expire(self._payload_key(call_id), ENDED_TTL)
+            await pipe.execute()
+
+    async def get(self, call_id: str) -> Optional[CallRecord]:
+        return self._decode(await self._redis.hgetall(self._key(call_id)))
+
+    async def get_payload(self, call_id: str) -> Optional[Dict[str, Any]]:
+        raw = await self._redis.get(self._payload_key(call_id))
+        return orjson.loads(raw) if raw else None
+
+    async def _prune(self):
+        # Members whose hash has expired by TTL, scored by last activity
+        await self._redis.zremrangebyscore(self._ACTIVE_SET, "-inf", time.time() - ACTIVE_TTL)
+
+    async def list_active(self) -> Dict[str, CallRecord]:
+        await self._prune()
+        call_ids = await self._redis.zrevrange(self._ACTIVE_SET, 0, MAX_ACTIVE_CALLS - 1)
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for call_id in call_ids:
+                pipe.hgetall(self._key(call_id.decode()))
+            rows = await pipe.execute()
+        records = {}
+        for call_id, raw in zip(call_ids, rows):
+            record = self._decode(raw)
+            if record is not None:
+                records[call_id.decode()] = record
+        return records
+
+    async def count_active(self) -> int:
+        await self._prune()
+        return await self._redis.zcard(self._ACTIVE_SET)
+
+    async def delete(self, call_id: str) -> bool:
+        """Remove a call, active or recently ended, and its payload"""
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(self._ACTIVE_SET, call_id)
+            pipe.delete(self._key(call_id), self._payload_key(call_id))
+            _, deleted = await pipe.execute()
+        # Ended calls are no longer in the active set, the key count says whether anything existed
+        return deleted > 0
+
+    async def aclose(self):
+        await self._redis.aclose()
+
+
+class CallEventWriter:
+    """
+    Applies webhook events to a store from one background task, in arrival
+    order, so webhook responses don't wait on persistence. When the queue is
+    full, emit() waits for room rather than dropping or reordering events.
+    """
+
+    def __init__(self, store, maxsize: int = 10_000):
+        self._store = store
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def emit(
+        self, call_id: str, phone_number: str, status: str, payload: Dict[str, Any], *, terminal: bool, create: bool
+    ):
+        event = (call_id, phone_number, status, payload, terminal, create)
+        if self._task is None:
+            # Not started (e.g. scripts and tests), write inline
+            await self._apply(event)
+        else:
+            await self._queue.put(event)
+
+    async def _apply(self, event):
+        call_id, phone_number, status, payload, terminal, create = event
+        # Late events for calls that already ended or were deleted are dropped by the store
+        if await self._store.record_webhook(call_id, phone_number, status, payload, create=create) and terminal:
+            await self._store.finish(call_id)
+
+    async def _run(self):
+        while True:
+            event = await self._queue.get()
+            try:
+                await self._apply(event)
+            except Exception as e:
+                logger.error("call_event_write_failed", call_id=event[0], error=str(e))
+            finally:
+                self._queue.task_done()
+
+    async def aclose(self, timeout: float = 5.0):
+        """Flush queued events (bounded by timeout), then stop the writer"""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("call_events_dropped", pending=self._queue.qsize())
+        self._task.cancel()
+        self._task = None
+
+
+def get_call_store():
+    """Redis-backed store when REDIS_URL is set, otherwise in-process"""
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url:
+        return RedisCallStore(redis_url)
+    return MemoryCallStore()
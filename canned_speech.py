@@ -0,0 +1,77 @@
+"""
+Fixed agent utterances, synthesized once per worker process and replayed from memory.
+Speaking these through session.say skips the LLM entirely. The audio is warmed
+in the background when the first session in a process starts, so by the time
+a phrase is needed the TTS round trip is usually skipped as well.
+"""
+
+import asyncio
+from typing import AsyncIterator, Optional
+
+import structlog
+from livekit import rtc
+from livekit.agents import AgentSession, tts
+
+logger = structlog.get_logger("voice-agent")
+
+CANNED_UTTERANCES = {
+    "no_transfer_number": "I don't have a number to transfer you to. Please contact support.",
+    "participant_missing": "Sorry, I cannot transfer the call right now as participant details are missing.",
+    "invalid_identity": "Sorry, there was an unexpected issue with the participant information, and I can't transfer the call.",
+    "transferring": "Please hold while I transfer you to a member of our team.",
+    "transfer_error": "There was an error transferring the call.",
+}
+
+# key -> synthesized frames, shared by every session in this process
+_audio_cache: dict[str, list[rtc.AudioFrame]] = {}
+# Background warm-up for this process, referenced so it isn't garbage collected
+_warm_task: Optional[asyncio.Task] = None
+
+
+async def _synthesize(engine: tts.TTS, text: str) -> list[rtc.AudioFrame]:
+    frames = []
+    async with engine.synthesize(text) as stream:
+        async for audio in stream:
+            frames.append(audio.frame)
+    return frames
+
+
+async def _replay(frames: list[rtc.AudioFrame]) -> AsyncIterator[rtc.AudioFrame]:
+    for frame in frames:
+        yield frame
+
+
+async def _cached_frames(session: AgentSession, key: str) -> Optional[list[rtc.AudioFrame]]:
+    frames = _audio_cache.get(key)
+    if frames is None and session.tts is not None:
+        try:
+            frames = await _synthesize(session.tts, CANNED_UTTERANCES[key])
+            _audio_cache[key] = frames
+        except Exception as e:
+            logger.warning("canned_synthesis_failed", key=key, error=str(e))
+    return frames
+
+
+async def _warm(session: AgentSession) -> None:
+    for key in CANNED_UTTERANCES:
+        if key not in _audio_cache:
+            await _cached_frames(session, key)
+
+
+def warm_canned(session: AgentSession) -> None:
+    """Start synthesizing the utterances this process has not cached yet, in the background"""
+    global _warm_task
+    if len(_audio_cache) == len(CANNED_UTTERANCES):
+        return
+    if _warm_task is None or _warm_task.done():
+        _warm_task = asyncio.create_task(_warm(session))
+
+
+async def say_canned(session: AgentSession, key: str) -> None:
+    """Speak a fixed utterance and wait for it to finish playing"""
+    text = CANNED_UTTERANCES[key]
+    frames = await _cached_frames(session, key)
+    if frames:
+        await session.say(text, audio=_replay(frames))
+    else:
+        await session.say(text)
@@ -0,0 +1,17 @@
+"""
+Vapi and LiveKit settings shared by the API and helper scripts.
+Read once from the environment (after loading .env) when first imported.
+"""
+
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+VAPI_TOKEN = os.getenv("VAPI_TOKEN")
+ASSISTANT_ID = os.getenv("ASSISTANT_ID")
+PHONE_NUMBER_ID = os.getenv("PHONE_NUMBER_ID")
+
+LIVEKIT_URL = os.getenv("LIVEKIT_URL")
+LIVEKIT_API_KEY = os.getenv("LIVEKIT_API_KEY")
+LIVEKIT_API_SECRET = os.getenv("LIVEKIT_API_SECRET")
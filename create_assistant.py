@@ -1,13 +1,10 @@
-from vapi import Vapi
-import os
+from vapi_client import get_client
 from dotenv import load_dotenv
-from support_assistant import create_support_assistant
 
 load_dotenv()
-client = Vapi(token=os.getenv("VAPI_TOKEN"))
 
 
-assistant = client.assistants.create(
+assistant = get_client().assistants.create(
     name="Sales Assistant",
     first_message="Hi! I'm calling about your interest in our software solutions.",
     model={
@@ -0,0 +1,96 @@
+"""
+Fixed, reviewed answers to a small set of FAQ questions.
+Caller utterances are fuzzy-matched against the configured questions so small
+transcription differences still hit; the answer served is always the one from
+the FAQ file, never LLM output, so nothing from one caller's context can reach another.
+"""
+
+import difflib
+import re
+from pathlib import Path
+from typing import Any, Mapping, Optional, Sequence
+
+import orjson
+
+_NON_WORD = re.compile(r"[^a-z0-9 ]+")
+# Days, dates and numbers make a question specific to one caller,
+# "open on sunday" and "open on saturday" are near-identical strings with different answers
+_SPECIFIC = re.compile(
+    r"\d|\b(?:monday|tuesday|wednesday|thursday|friday|saturday|sunday|weekend|today|tonight|"
+    r"tomorrow|yesterday|january|february|march|april|june|july|august|september|october|"
+    r"november|december|one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve)\b"
+)
+# Chat items produced while the LLM runs a tool
+_TOOL_ITEM_TYPES = frozenset({"function_call", "function_call_output"})
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace"""
+    return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+
+def pending_utterance(items: Sequence[Any]) -> Optional[str]:
+    """
+    Text of the last user message in a chat context's items, or None when a tool
+    call follows it: the reply to that turn has to come from the tool's output.
+    """
+    for item in reversed(items):
+        if item.type in _TOOL_ITEM_TYPES:
+            return None
+        if item.type == "message" and item.role == "user":
+            return item.text_content
+    return None
+
+
+def load_faq(path: str) -> dict[str, str]:
+    """Question -> answer pairs from a JSON object file, empty if the file doesn't exist"""
+    try:
+        data = orjson.loads(Path(path).read_bytes())
+    except FileNotFoundError:
+        return {}
+    return {str(question): str(answer) for question, answer in data.items()}
+
+
+class FaqAnswers:
+    """
+    Matches utterances to configured questions and returns their fixed answers.
+    Utterances mentioning days or numbers are never matched, even when close to a question.
+    """
+
+    def __init__(self, answers: Mapping[str, str], threshold: float = 0.88) -> None:
+        self.threshold = threshold
+        self._answers = {normalize(q): a for q, a in answers.items() if normalize(q) and a}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._answers)
+
+    def _question(self, utterance: str) -> Optional[str]:
+        """The configured question an utterance asks, if any"""
+        text = normalize(utterance)
+        if not text or _SPECIFIC.search(text):
+            return None
+        if text in self._answers:
+            return text
+
+        best_key, best_ratio = None, self.threshold
+        matcher = difflib.SequenceMatcher(b=text)
+        for question in self._answers:
+            matcher.set_seq1(question)
+            # Cheap upper bounds first, the full ratio only for plausible candidates
+            if matcher.real_quick_ratio() < best_ratio or matcher.quick_ratio() < best_ratio:
+                continue
+            ratio = matcher.ratio()
+            if ratio >= best_ratio:
+                best_key, best_ratio = question, ratio
+        return best_key
+
+    def match(self, utterance: str) -> Optional[str]:
+        """The fixed answer to the question an utterance asks, if any"""
+        question = self._question(utterance)
+        if question is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._answers[question]
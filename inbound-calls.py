@@ -6,43 +6,100 @@ It ensures SIP trunks and dispatch rules are properly configured.
 """
 
 import asyncio
+import functools
 import os
-import json
-import subprocess
+import re
+import mmap
+import logging
+import sys
+import orjson
+from typing import Optional
 from dotenv import load_dotenv
 from livekit import api
+from agent_pidfile import agent_alive
 
 # Load environment variables from .env file
 load_dotenv(override=True)
 
+logger = logging.getLogger(__name__)
+
+# Read once, after the .env override above
+LIVEKIT_URL = os.getenv("LIVEKIT_URL")
+LIVEKIT_API_KEY = os.getenv("LIVEKIT_API_KEY")
+LIVEKIT_API_SECRET = os.getenv("LIVEKIT_API_SECRET")
+PHONE_NUMBER = os.getenv("PHONE_NUMBER", "+15105550100")
+TECH_SUPPORT_PHONE_NUMBER = os.getenv("TECH_SUPPORT_PHONE_NUMBER", "+917204218098")
+
+# Unfiltered list requests, built once and never mutated
+_LIST_TRUNKS_REQUEST = api.ListSIPInboundTrunkRequest()
+_LIST_RULES_REQUEST = api.ListSIPDispatchRuleRequest()
+# Dispatch metadata for inbound calls, the same for every rule so encoded once
+_INBOUND_DISPATCH_METADATA = orjson.dumps({
+    "call_type": "inbound",
+    "transfer_to": TECH_SUPPORT_PHONE_NUMBER,
+}).decode()
+
+REQUIRED_AGENT_PATTERNS = (
+    "from livekit.agents import",
+    "def entrypoint",
+    "cli.run_app",
+)
+
+
+@functools.lru_cache(maxsize=4)
+def _agent_pattern(agent_name: str) -> re.Pattern:
+    """One alternation matching every pattern verify_agent_setup looks for"""
+    patterns = (*REQUIRED_AGENT_PATTERNS, f'agent_name="{agent_name}"')
+    return re.compile(b"|".join(re.escape(p.encode()) for p in patterns))
+
+
+@functools.lru_cache(maxsize=4)
+def _scan_agent_file(path: str, mtime_ns: int, agent_name: str) -> frozenset:
+    """Patterns present in the agent file, rescanned only when its mtime changes"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return frozenset()
+        # Scan the page cache directly, no read copy or UTF-8 decode of the file
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return frozenset(m.decode() for m in _agent_pattern(agent_name).findall(mm))
+
+
 class InboundCallSetup:
+    _instance = None
+    
     def __init__(self):
         self.livekit_api = api.LiveKitAPI(
-            url=os.getenv("LIVEKIT_URL"),
-            api_key=os.getenv("LIVEKIT_API_KEY"),
-            api_secret=os.getenv("LIVEKIT_API_SECRET")
+            url=LIVEKIT_URL,
+            api_key=LIVEKIT_API_KEY,
+            api_secret=LIVEKIT_API_SECRET
         )
         self.agent_name = "voice-agent"  # Must match the agent name in agent.py
+    
+    @classmethod
+    def get(cls):
+        """Shared instance, so one LiveKitAPI connection pool serves the whole run"""
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
         
     async def list_existing_trunks(self):
         """List all existing SIP inbound trunks"""
-        print("📋 Listing existing SIP inbound trunks...")
-        list_request = api.ListSIPInboundTrunkRequest()
-        existing_trunks = await self.livekit_api.sip.list_sip_inbound_trunk(list_request)
+        logger.info("📋 Listing existing SIP inbound trunks...")
+        existing_trunks = await self.livekit_api.sip.list_sip_inbound_trunk(_LIST_TRUNKS_REQUEST)
         
-        print(f"Found {len(existing_trunks.items)} existing trunk(s):")
+        logger.info("Found %s existing trunk(s):", len(existing_trunks.items))
         for trunk in existing_trunks.items:
-            print(f"  - Trunk ID: {trunk.sip_trunk_id}")
-            print(f"    Name: {trunk.name}")
-            print(f"    Numbers: {trunk.numbers}")
-            print(f"    Krisp enabled: {trunk.krisp_enabled}")
-        print()
+            logger.info(
+                "  - Trunk ID: %s\n    Name: %s\n    Numbers: %s\n    Krisp enabled: %s",
+                trunk.sip_trunk_id, trunk.name, trunk.numbers, trunk.krisp_enabled,
+            )
         
         return existing_trunks.items
 
-    async def ensure_trunk_exists(self, phone_number: str = "+15105550100"):
+    async def ensure_trunk_exists(self, phone_number: str = "+15105550100", existing_trunks=None):
         """Ensure a trunk exists for the given phone number"""
-        existing_trunks = await self.list_existing_trunks()
+        if existing_trunks is None:
+            existing_trunks = await self.list_existing_trunks()
         
         # Check if the desired phone number is already in use
         existing_trunk_with_number = None
@@ -52,12 +109,13 @@ class InboundCallSetup:
                 break
         
         if existing_trunk_with_number:
-            print(f"✅ Phone number {phone_number} is already configured in trunk:")
-            print(f"   ID: {existing_trunk_with_number.sip_trunk_id}")
-            print(f"   Name: {existing_trunk_with_number.name}")
+            logger.info(
+                "✅ Phone number %s is already configured in trunk:\n   ID: %s\n   Name: %s",
+                phone_number, existing_trunk_with_number.sip_trunk_id, existing_trunk_with_number.name,
+            )
             return existing_trunk_with_number.sip_trunk_id
         else:
-            print(f"📞 Creating new trunk with number {phone_number}...")
+            logger.info("📞 Creating new trunk with number %s...", phone_number)
             trunk_info = api.SIPInboundTrunkInfo(
                 name="Voice Agent Inbound Trunk",
                 numbers=[phone_number],
@@ -66,32 +124,30 @@ class InboundCallSetup:
 
             request = api.CreateSIPInboundTrunkRequest(trunk=trunk_info)
             new_trunk = await self.livekit_api.sip.create_sip_inbound_trunk(request)
-            print(f"✅ Created new trunk: {new_trunk.sip_trunk_id}")
+            logger.info("✅ Created new trunk: %s", new_trunk.sip_trunk_id)
             return new_trunk.sip_trunk_id
 
     async def list_dispatch_rules(self):
         """List existing dispatch rules"""
-        print("📋 Listing existing dispatch rules...")
+        logger.info("📋 Listing existing dispatch rules...")
         try:
-            list_request = api.ListSIPDispatchRuleRequest()
-            dispatch_rules = await self.livekit_api.sip.list_sip_dispatch_rule(list_request)
+            dispatch_rules = await self.livekit_api.sip.list_sip_dispatch_rule(_LIST_RULES_REQUEST)
             
-            print(f"Found {len(dispatch_rules.items)} dispatch rule(s):")
+            logger.info("Found %s dispatch rule(s):", len(dispatch_rules.items))
             for rule in dispatch_rules.items:
-                print(f"  - Rule ID: {rule.sip_dispatch_rule_id}")
-                print(f"    Name: {rule.name}")
-                print(f"    Trunk IDs: {rule.trunk_ids}")
-                print(f"    Hide phone number: {rule.hide_phone_number}")
-            print()
+                logger.info(
+                    "  - Rule ID: %s\n    Name: %s\n    Trunk IDs: %s\n    Hide phone number: %s",
+                    rule.sip_dispatch_rule_id, rule.name, rule.trunk_ids, rule.hide_phone_number,
+                )
             
             return dispatch_rules.items
         except Exception as e:
-            print(f"⚠️  Could not list dispatch rules: {e}")
+            logger.warning("⚠️  Could not list dispatch rules: %s", e)
             return []
 
     async def create_dispatch_rule(self, trunk_id: str):
         """Create a dispatch rule for inbound calls"""
-        print(f"🔄 Creating dispatch rule for trunk {trunk_id}...")
+        logger.info("🔄 Creating dispatch rule for trunk %s...", trunk_id)
         
         # Create dispatch rule using the correct structure
         dispatch_rule = api.SIPDispatchRule(
@@ -104,13 +160,12 @@ class InboundCallSetup:
         # Room configuration that includes our agent (using explicit dispatch)
         room_config = api.RoomConfiguration(
             max_participants=10,
+            # Tear call rooms down quickly once everyone has left
+            empty_timeout=30,
             agents=[
                 api.RoomAgentDispatch(
                     agent_name=self.agent_name,  # This enables explicit dispatch
-                    metadata=json.dumps({
-                        "call_type": "inbound",
-                        "transfer_to": os.getenv("TECH_SUPPORT_PHONE_NUMBER", "+917204218098")
-                    })
+                    metadata=_INBOUND_DISPATCH_METADATA
                 )
             ]
         )
@@ -125,15 +180,16 @@ class InboundCallSetup:
         
         try:
             new_rule = await self.livekit_api.sip.create_sip_dispatch_rule(request)
-            print(f"✅ Created dispatch rule: {new_rule.sip_dispatch_rule_id}")
+            logger.info("✅ Created dispatch rule: %s", new_rule.sip_dispatch_rule_id)
             return new_rule.sip_dispatch_rule_id
         except Exception as e:
-            print(f"❌ Failed to create dispatch rule: {e}")
+            logger.error("❌ Failed to create dispatch rule: %s", e)
             return None
 
-    async def ensure_dispatch_rule_exists(self, trunk_id: str):
+    async def ensure_dispatch_rule_exists(self, trunk_id: str, existing_rules=None):
         """Ensure a dispatch rule exists for the trunk"""
-        existing_rules = await self.list_dispatch_rules()
+        if existing_rules is None:
+            existing_rules = await self.list_dispatch_rules()
         
         # Check if we already have a rule for this trunk
         existing_rule = None
@@ -143,167 +199,185 @@ class InboundCallSetup:
                 break
         
         if existing_rule:
-            print(f"✅ Dispatch rule already exists for trunk {trunk_id}:")
-            print(f"   Rule ID: {existing_rule.sip_dispatch_rule_id}")
-            print(f"   Name: {existing_rule.name}")
+            logger.info(
+                "✅ Dispatch rule already exists for trunk %s:\n   Rule ID: %s\n   Name: %s",
+                trunk_id, existing_rule.sip_dispatch_rule_id, existing_rule.name,
+            )
             return existing_rule.sip_dispatch_rule_id
         else:
             return await self.create_dispatch_rule(trunk_id)
 
-    def check_agent_running(self):
+    async def check_agent_running(self):
         """Check if the voice agent is running"""
-        print("🔍 Checking if voice agent is running...")
+        logger.info("🔍 Checking if voice agent is running...")
+        
+        # Probe the PID the agent recorded at startup, no process table scan needed
+        alive = agent_alive()
+        if alive is not None:
+            if alive:
+                logger.info("✅ Voice agent appears to be running!")
+            else:
+                logger.warning("⚠️  Voice agent is not running.")
+                logger.info("💡 To start the agent, run: python agent.py dev")
+            return alive
         
-        # Check if agent.py process is running
+        # No PID file (agent started some other way), fall back to pgrep
         try:
-            result = subprocess.run(
-                ["pgrep", "-f", "agent.py"],
-                capture_output=True,
-                text=True
+            # Spawned without blocking the loop, so it overlaps the LiveKit API calls
+            proc = await asyncio.create_subprocess_exec(
+                "pgrep", "-f", "agent.py",
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL,
             )
             
-            if result.returncode == 0:
-                print("✅ Voice agent appears to be running!")
+            if await proc.wait() == 0:
+                logger.info("✅ Voice agent appears to be running!")
                 return True
             else:
-                print("⚠️  Voice agent is not running.")
-                print("💡 To start the agent, run: python agent.py dev")
+                logger.warning("⚠️  Voice agent is not running.")
+                logger.info("💡 To start the agent, run: python agent.py dev")
                 return False
         except Exception as e:
-            print(f"⚠️  Could not check agent status: {e}")
+            logger.warning("⚠️  Could not check agent status: %s", e)
             return False
 
     def verify_agent_setup(self):
         """Verify that the agent is properly configured for inbound calls"""
-        print("🔍 Verifying agent configuration...")
+        logger.info("🔍 Verifying agent configuration...")
         
         # Check if agent.py file exists
-        if not os.path.exists("agent.py"):
-            print("❌ agent.py file not found!")
+        try:
+            mtime_ns = os.stat("agent.py").st_mtime_ns
+        except FileNotFoundError:
+            logger.error("❌ agent.py file not found!")
             return False
         
         # Check if agent.py contains the required agent name
         try:
-            with open("agent.py", "r") as f:
-                content = f.read()
-                if f'agent_name="{self.agent_name}"' in content:
-                    print(f"✅ Agent file contains correct agent_name: {self.agent_name}")
-                    
-                    # Check for required imports and patterns
-                    required_patterns = [
-                        "from livekit.agents import",
-                        "def entrypoint",
-                        "cli.run_app"
-                    ]
-                    
-                    missing_patterns = []
-                    for pattern in required_patterns:
-                        if pattern not in content:
-                            missing_patterns.append(pattern)
-                    
-                    if missing_patterns:
-                        print("⚠️  Agent file may be missing some required patterns:")
-                        for pattern in missing_patterns:
-                            print(f"   - {pattern}")
-                        return False
-                    else:
-                        print("✅ Agent file appears to be properly structured")
-                        return True
-                else:
-                    print(f"⚠️  Agent file does not contain agent_name='{self.agent_name}'")
-                    print("💡 Make sure your agent.py uses explicit dispatch with the correct name")
-                    return False
+            found = _scan_agent_file("agent.py", mtime_ns, self.agent_name)
         except Exception as e:
-            print(f"❌ Error reading agent.py: {e}")
+            logger.error("❌ Error reading agent.py: %s", e)
+            return False
+        
+        if f'agent_name="{self.agent_name}"' in found:
+            logger.info("✅ Agent file contains correct agent_name: %s", self.agent_name)
+            
+            # Check for required imports and patterns
+            missing_patterns = [p for p in REQUIRED_AGENT_PATTERNS if p not in found]
+            
+            if missing_patterns:
+                logger.warning("⚠️  Agent file may be missing some required patterns:")
+                for pattern in missing_patterns:
+                    logger.info("   - %s", pattern)
+                return False
+            else:
+                logger.info("✅ Agent file appears to be properly structured")
+                return True
+        else:
+            logger.warning("⚠️  Agent file does not contain agent_name='%s'", self.agent_name)
+            logger.info("💡 Make sure your agent.py uses explicit dispatch with the correct name")
             return False
 
     async def setup_inbound_calls(self, phone_number: str = "+15105550100"):
         """Complete setup for inbound call handling"""
-        print("🚀 Setting up inbound call handling...")
+        logger.info("🚀 Setting up inbound call handling...")
         
-        # Validate phone number
-        if not phone_number or phone_number.strip() == "":
-            print("❌ Error: Phone number is empty or not set!")
-            print("💡 Please set PHONE_NUMBER in your .env file")
-            print("   Example: PHONE_NUMBER='+15105550100'")
+        # Validate phone number, carrying the stripped value forward
+        phone_number = (phone_number or "").strip()
+        if not phone_number:
+            logger.error(
+                "❌ Error: Phone number is empty or not set!\n"
+                "💡 Please set PHONE_NUMBER in your .env file\n"
+                "   Example: PHONE_NUMBER='+15105550100'"
+            )
             return False
         
-        print(f"📞 Phone number: {phone_number}")
-        print(f"🤖 Agent name: {self.agent_name}")
-        print()
+        logger.info("📞 Phone number: %s", phone_number)
+        logger.info("🤖 Agent name: %s", self.agent_name)
         
         try:
+            # The listings and local agent checks are independent, run them concurrently
+            existing_trunks, existing_rules, agent_config_ok, agent_running = await asyncio.gather(
+                self.list_existing_trunks(),
+                self.list_dispatch_rules(),
+                asyncio.to_thread(self.verify_agent_setup),
+                self.check_agent_running(),
+            )
+            
             # Step 1: Ensure trunk exists
-            trunk_id = await self.ensure_trunk_exists(phone_number)
+            trunk_id = await self.ensure_trunk_exists(phone_number, existing_trunks)
             
             # Step 2: Ensure dispatch rule exists
-            rule_id = await self.ensure_dispatch_rule_exists(trunk_id)
+            rule_id = await self.ensure_dispatch_rule_exists(trunk_id, existing_rules)
             
             if rule_id:
-                print()
-                print("🎉 Inbound call setup completed successfully!")
-                print()
-                print("📋 Summary:")
-                print(f"   📞 Phone Number: {phone_number}")
-                print(f"   🏗️  Trunk ID: {trunk_id}")
-                print(f"   📨 Dispatch Rule ID: {rule_id}")
-                print(f"   🤖 Agent Name: {self.agent_name}")
-                print()
-                
-                # Step 3: Verify agent configuration
-                agent_config_ok = self.verify_agent_setup()
-                
-                # Step 4: Check if agent is running
-                agent_running = self.check_agent_running()
+                # User-facing summary, written in one go
+                print("\n".join([
+                    "",
+                    "🎉 Inbound call setup completed successfully!",
+                    "",
+                    "📋 Summary:",
+                    f"   📞 Phone Number: {phone_number}",
+                    f"   🏗️  Trunk ID: {trunk_id}",
+                    f"   📨 Dispatch Rule ID: {rule_id}",
+                    f"   🤖 Agent Name: {self.agent_name}",
+                    "",
+                ]))
                 
                 if agent_config_ok and agent_running:
-                    print("✅ System is ready to receive calls!")
-                    print(f"📞 Call {phone_number} to test your voice agent.")
+                    logger.info("✅ System is ready to receive calls!")
+                    logger.info("📞 Call %s to test your voice agent.", phone_number)
                 elif agent_config_ok and not agent_running:
-                    print("⚠️  Agent is configured correctly but not running.")
-                    print("⚠️  To complete setup, start your voice agent:")
-                    print("   python agent.py dev")
-                    print()
-                    print(f"Then you can call your agent at: {phone_number}")
+                    logger.warning(
+                        "⚠️  Agent is configured correctly but not running.\n"
+                        "⚠️  To complete setup, start your voice agent:\n"
+                        "   python agent.py dev\n\n"
+                        "Then you can call your agent at: %s",
+                        phone_number,
+                    )
                 else:
-                    print("❌ Agent configuration issues detected.")
-                    print("💡 Please fix the agent configuration before starting it.")
+                    logger.error("❌ Agent configuration issues detected.")
+                    logger.info("💡 Please fix the agent configuration before starting it.")
                 
                 return True
             else:
-                print("❌ Failed to create dispatch rule. Setup incomplete.")
+                logger.error("❌ Failed to create dispatch rule. Setup incomplete.")
                 return False
                 
         except Exception as e:
-            print(f"❌ Setup failed: {e}")
+            logger.error("❌ Setup failed: %s", e)
             return False
 
     async def cleanup(self):
         """Cleanup resources"""
         await self.livekit_api.aclose()
+        if InboundCallSetup._instance is self:
+            InboundCallSetup._instance = None
+
+async def run_setup(setup: InboundCallSetup):
+    """Configure trunk and dispatch rule, then print next steps"""
+    # Use the phone number from your .env or default
+    phone_number = PHONE_NUMBER
+    success = await setup.setup_inbound_calls(phone_number)
+    
+    if success:
+        print("\n".join([
+            "\n🎯 Next steps:",
+            "1. Make sure your agent is running: python agent.py dev",
+            f"2. Call {phone_number} to test your voice agent",
+            "3. Check LiveKit dashboard for call logs and metrics",
+            "\n💡 Tip: Run 'python inbound-calls.py status' to check system status anytime",
+        ]))
 
 async def main():
     """Main function to set up inbound call handling"""
-    import sys
-    
-    # Check if user wants to see status only
-    if len(sys.argv) > 1 and sys.argv[1] in ['--status', '-s', 'status']:
-        await show_status()
-        return
-    
-    setup = InboundCallSetup()
+    setup = InboundCallSetup.get()
     
     try:
-        # Use the phone number from your .env or default
-        phone_number = os.getenv("PHONE_NUMBER", "+15105550100")
-        success = await setup.setup_inbound_calls(phone_number)
-        
-        if success:
-            print("\n🎯 Next steps:")
-            print("1. Make sure your agent is running: python agent.py dev")
-            print(f"2. Call {phone_number} to test your voice agent")
-            print("3. Check LiveKit dashboard for call logs and metrics")
-            print("\n💡 Tip: Run 'python inbound-calls.py status' to check system status anytime")
+        # Subcommand handlers, plain setup when no known command is given
+        command = sys.argv[1] if len(sys.argv) > 1 else None
+        handler = COMMANDS.get(command, run_setup)
+        await handler(setup)
         
     except KeyboardInterrupt:
         print("\n⏹️  Setup interrupted by user")
@@ -313,40 +387,38 @@ async def main():
         await setup.cleanup()
         print("\n✅ Cleanup completed")
 
-async def show_status():
+async def show_status(setup: Optional[InboundCallSetup] = None):
     """Show current system status"""
-    setup = InboundCallSetup()
+    # Reuse the caller's instance (and its connections) when given one
+    owns_setup = setup is None
+    setup = setup or InboundCallSetup.get()
     try:
         print("📊 LiveKit Inbound Call System Status")
         print("=" * 50)
         
         # Check phone number
-        phone_number = os.getenv("PHONE_NUMBER", "+15105550100")
+        phone_number = PHONE_NUMBER
         print(f"📞 Configured Phone Number: {phone_number}")
         
         # Check trunks
         existing_trunks = await setup.list_existing_trunks()
-        trunk_found = False
-        for trunk in existing_trunks:
-            if phone_number in trunk.numbers:
-                print(f"✅ SIP Trunk: {trunk.sip_trunk_id} ({trunk.name})")
-                trunk_found = True
-                break
+        matching_trunks = [trunk for trunk in existing_trunks if phone_number in trunk.numbers]
         
-        if not trunk_found:
+        if not matching_trunks:
             print("❌ No SIP trunk found for this phone number")
             return
         
+        trunk = matching_trunks[0]
+        print(f"✅ SIP Trunk: {trunk.sip_trunk_id} ({trunk.name})")
+        # Filtered once, rather than re-scanning every trunk for each rule
+        matching_trunk_ids = {trunk.sip_trunk_id for trunk in matching_trunks}
+        
         # Check dispatch rules
         existing_rules = await setup.list_dispatch_rules()
-        rule_found = False
-        for rule in existing_rules:
-            if any(trunk.sip_trunk_id in rule.trunk_ids for trunk in existing_trunks if phone_number in trunk.numbers):
-                print(f"✅ Dispatch Rule: {rule.sip_dispatch_rule_id} ({rule.name or 'Unnamed'})")
-                rule_found = True
-                break
-        
-        if not rule_found:
+        rule = next((r for r in existing_rules if not matching_trunk_ids.isdisjoint(r.trunk_ids)), None)
+        if rule is not None:
+            print(f"✅ Dispatch Rule: {rule.sip_dispatch_rule_id} ({rule.name or 'Unnamed'})")
+        else:
             print("❌ No dispatch rule found for this phone number")
             return
         
@@ -358,7 +430,7 @@ async def show_status():
             print("❌ Agent Configuration: Issues detected")
         
         # Check if agent is running
-        agent_running = setup.check_agent_running()
+        agent_running = await setup.check_agent_running()
         if agent_running:
             print("✅ Agent Status: Running and ready")
             print()
@@ -369,7 +441,16 @@ async def show_status():
             print("🚀 To start the agent: python agent.py dev")
         
     finally:
-        await setup.cleanup()
+        if owns_setup:
+            await setup.cleanup()
+
+COMMANDS = {
+    "--status": show_status,
+    "-s": show_status,
+    "status": show_status,
+}
 
 if __name__ == "__main__":
+    # Plain messages on stdout, the same place the summaries are printed
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
     asyncio.run(main())
@@ -1,30 +1,43 @@
-from vapi import Vapi
-import os
-from dotenv import load_dotenv
-from support_assistant import create_support_assistant
+import logging
 
-load_dotenv()
-client = Vapi(token=os.getenv("VAPI_TOKEN"))
+from vapi_client import call_with_backoff, get_client, get_async_client
+from config import ASSISTANT_ID, PHONE_NUMBER_ID
+
+logger = logging.getLogger(__name__)
 
 
 def configure_inbound_calls(phone_number_id: str, assistant_id: str):
     try:
-        updated_number = client.phone_numbers.update(
+        updated_number = get_client().phone_numbers.update(
             phone_number_id,  # The ID of the phone number to update
             request={"assistant_id": assistant_id}  # The payload passed as the 'request' keyword argument
         )
-        print(f"Phone number {phone_number_id} configured to use assistant {assistant_id}")
+        logger.info("Phone number %s configured to use assistant %s", phone_number_id, assistant_id)
         return updated_number
     except Exception as error:
-        print(f"Error configuring inbound calls: {error}")
+        logger.error("Error configuring inbound calls: %s", error)
         raise error
 
 
-phone_number_id = os.getenv("PHONE_NUMBER_ID")
-assistant_id = os.getenv("ASSISTANT_ID")
-
+async def aconfigure_inbound_calls(phone_number_id: str, assistant_id: str):
+    """configure_inbound_calls over the async client, for use inside the event loop"""
+    try:
+        updated_number = await call_with_backoff(
+            get_async_client().phone_numbers.update,
+            phone_number_id,
+            request={"assistant_id": assistant_id}
+        )
+        logger.info("Phone number %s configured to use assistant %s", phone_number_id, assistant_id)
+        return updated_number
+    except Exception as error:
+        logger.error("Error configuring inbound calls: %s", error)
+        raise error
 
 
+phone_number_id = PHONE_NUMBER_ID
+assistant_id = ASSISTANT_ID
 
 
-# configure_inbound_calls(phone_number_id, assistant_id)
\ No newline at end of file
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    configure_inbound_calls(phone_number_id, assistant_id)
\ No newline at end of file
@@ -0,0 +1,160 @@
+"""
+Structured JSON logging shared by the API and the agent worker.
+structlog loggers render straight to stdout as orjson bytes with no stdlib
+Handler in between; records from stdlib loggers (libraries, helper modules)
+can optionally be rendered into the same JSON shape.
+Output is handed to a background writer thread, so logging from the event
+loop never blocks on a slow or full stdout pipe.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from typing import Optional
+
+import orjson
+import structlog
+
+_SHARED_PROCESSORS = [
+    structlog.processors.add_log_level,
+    structlog.processors.TimeStamper(fmt="iso"),
+]
+
+
+def _dumps_str(obj, **kwargs) -> str:
+    return orjson.dumps(obj, default=str).decode()
+
+
+# Upper bound on records coalesced into one write
+_MAX_BATCH = 512
+
+
+class _QueuedStream:
+    """Binary stream whose writes are performed by a background thread"""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._start()
+        # Threads don't survive fork, give forked job processes their own writer
+        os.register_at_fork(after_in_child=self._start)
+        atexit.register(self.close)
+
+    def _start(self):
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._drain, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def _drain(self):
+        closed = False
+        while not closed:
+            # Block for one record, then take whatever else is already queued
+            # so a burst of log lines costs a single write and flush
+            pending = [self._queue.get()]
+            while len(pending) < _MAX_BATCH:
+                try:
+                    pending.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in pending:
+                closed = True
+                pending = pending[:pending.index(None)]
+            if pending:
+                self._stream.write(b"".join(pending))
+                self._stream.flush()
+
+    def write(self, data: bytes):
+        self._queue.put(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=1)
+
+
+class _QueuedStreamHandler(logging.Handler):
+    """Writes formatted stdlib records to the shared writer, so they never interleave with structlog lines"""
+
+    def __init__(self, stream: _QueuedStream):
+        super().__init__()
+        self._stream = stream
+
+    def emit(self, record):
+        try:
+            self._stream.write(self.format(record).encode() + b"\n")
+        except Exception:
+            self.handleError(record)
+
+
+_stdout: Optional[_QueuedStream] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _default_level() -> int:
+    """LOG_LEVEL from the environment (name or number), INFO if unset"""
+    value = os.getenv("LOG_LEVEL", "INFO").upper()
+    if value.isdigit():
+        return int(value)
+    level = logging.getLevelName(value)
+    return level if isinstance(level, int) else logging.INFO
+
+
+def configure_logging(level: Optional[int] = None, *, stdlib: bool = True) -> None:
+    """
+    Configure structlog for this process, at LOG_LEVEL unless a level is given.
+    With stdlib=True the root logger is also routed through the JSON formatter;
+    the LiveKit worker passes False since its CLI owns stdlib logging setup.
+    """
+    global _stdout, _listener
+    if level is None:
+        level = _default_level()
+    if _stdout is None:
+        _stdout = _QueuedStream(sys.stdout.buffer)
+        # Registered once and after the writer's own close, so it runs first at exit
+        # and the listener's last records still reach the writer
+        atexit.register(_stop_listener)
+
+    structlog.configure(
+        processors=[
+            structlog.contextvars.merge_contextvars,
+            *_SHARED_PROCESSORS,
+            structlog.processors.format_exc_info,
+            structlog.processors.JSONRenderer(serializer=orjson.dumps),
+        ],
+        wrapper_class=structlog.make_filtering_bound_logger(level),
+        logger_factory=structlog.BytesLoggerFactory(file=_stdout),
+        cache_logger_on_first_use=True,
+    )
+
+    if stdlib:
+        handler = _QueuedStreamHandler(_stdout)
+        handler.setFormatter(
+            structlog.stdlib.ProcessorFormatter(
+                foreign_pre_chain=_SHARED_PROCESSORS,
+                processors=[
+                    structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+                    structlog.processors.JSONRenderer(serializer=_dumps_str),
+                ],
+            )
+        )
+        # Records are formatted and written on the listener's thread
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        _stop_listener()
+        _listener = logging.handlers.QueueListener(log_queue, handler)
+        _listener.start()
+
+        root = logging.getLogger()
+        root.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+        root.setLevel(level)
@@ -1,15 +1,35 @@
-from vapi import Vapi
-import os
-from dotenv import load_dotenv
-from support_assistant import create_support_assistant
+from vapi_client import call_with_backoff, get_client, get_async_client
+import asyncio
 import logging
+from config import ASSISTANT_ID, PHONE_NUMBER_ID
 
-load_dotenv()
 logger = logging.getLogger(__name__)
 
-client = Vapi(token=os.getenv("VAPI_TOKEN"))
-assistant_id = os.getenv("ASSISTANT_ID")
-phone_number_id = os.getenv("PHONE_NUMBER_ID")
+assistant_id = ASSISTANT_ID
+phone_number_id = PHONE_NUMBER_ID
+
+
+def _call_params(assistant_id: str, target_phone_number: str, context_data: dict = None) -> dict:
+    """Vapi calls.create arguments, shared by the sync and async paths"""
+    call_params = {
+        "assistant_id": assistant_id,
+        "phone_number_id": phone_number_id,
+        "customer": {
+            "number": target_phone_number,
+        },
+    }
+    
+    # Add context data if provided
+    if context_data:
+        call_params["metadata"] = context_data
+    
+    logger.info("Making outbound call to %s with assistant %s", target_phone_number, assistant_id)
+    return call_params
+
+
+def _initiated(call):
+    logger.info("Outbound call initiated successfully: %s", getattr(call, "id", "unknown_id"))
+    return call
 
 
 def make_outbound_call(assistant_id: str, target_phone_number: str, context_data: dict = None):
@@ -24,32 +44,92 @@ def make_outbound_call(assistant_id: str, target_phone_number: str, context_data
     Returns:
         Call object from Vapi
     """
+    call_params = _call_params(assistant_id, target_phone_number, context_data)
     try:
-        # Prepare call parameters
-        call_params = {
-            "assistant_id": assistant_id,
-            "phone_number_id": phone_number_id,
-            "customer": {
-                "number": target_phone_number,
-            },
-        }
-        
-        # Add context data if provided
-        if context_data:
-            call_params["metadata"] = context_data
-        
-        logger.info(f"Making outbound call to {target_phone_number} with assistant {assistant_id}")
-        
-        call = client.calls.create(**call_params)
-        
-        logger.info(f"Outbound call initiated successfully: {call.id if hasattr(call, 'id') else 'unknown_id'}")
-        return call
+        return _initiated(get_client().calls.create(**call_params))
+    except Exception as error:
+        logger.error("Error making outbound call to %s: %s", target_phone_number, error)
+        raise error
+
+
+async def make_outbound_call_async(assistant_id: str, target_phone_number: str, context_data: dict = None):
+    """
+    Make an outbound call using the shared async Vapi client,
+    without blocking the event loop for the API round trip.
+    
+    Args:
+        assistant_id: The assistant to use for the call
+        target_phone_number: The phone number to call
+        context_data: Optional context data for the call
         
+    Returns:
+        Call object from Vapi
+    """
+    call_params = _call_params(assistant_id, target_phone_number, context_data)
+    try:
+        return _initiated(await call_with_backoff(get_async_client().calls.create, **call_params))
     except Exception as error:
-        logger.error(f"Error making outbound call to {target_phone_number}: {error}")
+        logger.error("Error making outbound call to %s: %s", target_phone_number, error)
         raise error
 
 
+class BufferedOutbound:
+    """
+    Collects outbound calls and dials each batch concurrently instead of one
+    round trip at a time. Batches go out when flush_size calls are queued and
+    when the context exits.
+    
+        async with BufferedOutbound(assistant_id) as outbound:
+            for number in numbers:
+                await outbound.try_call(number)
+        results = outbound.results
+    """
+    
+    def __init__(self, assistant_id: str = None, flush_size: int = 50):
+        self.assistant_id = assistant_id or ASSISTANT_ID
+        self.flush_size = flush_size
+        self.buf = []
+        # Call objects or exceptions, in the order the calls were queued
+        self.results = []
+    
+    async def try_call(self, target_phone_number: str, context_data: dict = None):
+        self.buf.append((target_phone_number, context_data))
+        if len(self.buf) >= self.flush_size:
+            await self.flush()
+    
+    async def flush(self):
+        batch, self.buf = self.buf, []
+        if not batch:
+            return
+        self.results.extend(await asyncio.gather(
+            *(make_outbound_call_async(self.assistant_id, number, context) for number, context in batch),
+            return_exceptions=True,
+        ))
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.flush()
+
+
+async def make_outbound_calls_batch(numbers: list, assistant_id: str = None, max_concurrency: int = 10):
+    """
+    Dial several numbers concurrently, at most max_concurrency in flight.
+    
+    Returns:
+        List of Call objects or exceptions, one per number in input order
+    """
+    assistant_id = assistant_id or ASSISTANT_ID
+    sem = asyncio.Semaphore(max_concurrency)
+    
+    async def dial(number):
+        async with sem:
+            return await make_outbound_call_async(assistant_id, number, {"call_type": "outbound"})
+    
+    return await asyncio.gather(*(dial(n) for n in numbers), return_exceptions=True)
+
+
 def make_outbound_call_with_livekit_context(target_phone_number: str, transfer_to: str = "+917204218098"):
     """
     Make an outbound call with LiveKit context metadata
@@ -83,7 +163,7 @@ def make_outbound_call_with_livekit_context(target_phone_number: str, transfer_t
         }
         
     except Exception as error:
-        logger.error(f"Error in outbound call with LiveKit context: {error}")
+        logger.error("Error in outbound call with LiveKit context: %s", error)
         return {
             "vapi_call": None,
             "livekit_metadata": None,
@@ -97,7 +177,17 @@ if __name__ == "__main__":
     # Only run if explicitly called as script
     import sys
     
-    if len(sys.argv) > 1:
+    if len(sys.argv) > 2 and sys.argv[1] == "--outbound-batch":
+        numbers = [n.strip() for n in sys.argv[2].split(",") if n.strip()]
+        print(f"Making {len(numbers)} outbound calls")
+        
+        results = asyncio.run(make_outbound_calls_batch(numbers))
+        for number, result in zip(numbers, results):
+            if isinstance(result, Exception):
+                print(f"{number}: failed: {result}")
+            else:
+                print(f"{number}: Vapi Call ID {getattr(result, 'id', 'unknown')}")
+    elif len(sys.argv) > 1:
         target_number = sys.argv[1]
         print(f"Making outbound call to {target_number}")
         
@@ -112,4 +202,5 @@ if __name__ == "__main__":
             print(f"Error: {e}")
     else:
         print("Usage: python make_outbound_call.py <phone_number>")
+        print("       python make_outbound_call.py --outbound-batch <n1,n2,...>")
         print("Example: python make_outbound_call.py +1234567890")
@@ -1,17 +1,13 @@
-from vapi import Vapi
-import os
-from dotenv import load_dotenv
-from support_assistant import create_support_assistant
+from vapi_client import get_client
+from config import ASSISTANT_ID, PHONE_NUMBER_ID
 
-load_dotenv()
-client = Vapi(token=os.getenv("VAPI_TOKEN"))
-assistant_id = os.getenv("ASSISTANT_ID")
-phone_number_id = os.getenv("PHONE_NUMBER_ID")
+assistant_id = ASSISTANT_ID
+phone_number_id = PHONE_NUMBER_ID
 
 
 def make_outbound_call(assistant_id: str, phone_number: str):
     try:
-        call = client.calls.create(
+        call = get_client().calls.create(
             assistant_id=assistant_id,
             phone_number_id=phone_number_id,
             customer={
@@ -25,5 +21,6 @@ def make_outbound_call(assistant_id: str, phone_number: str):
         print(f"Error making outbound call: {error}")
         raise error
 
-#  number for testing
-make_outbound_call(assistant_id, "+917204218098")
+if __name__ == "__main__":
+    #  number for testing
+    make_outbound_call(assistant_id, "+917204218098")
@@ -1,14 +1,12 @@
-from vapi import Vapi
-import os
+from vapi_client import get_client
 from dotenv import load_dotenv
 load_dotenv()
-client = Vapi(token=os.getenv("VAPI_TOKEN"))
 
 
 def purchase_phone_number():
     try:
         # Purchase a phone number
-        phone_number = client.phone_numbers.create(
+        phone_number = get_client().phone_numbers.create(
             fallback_destination={
                 "type": "number",
                 "number": "+1234567890",  # Your fallback number
@@ -22,5 +20,5 @@ def purchase_phone_number():
         raise error
 
 
-
-purchase_phone_number()
\ No newline at end of file
+if __name__ == "__main__":
+    purchase_phone_number()
\ No newline at end of file
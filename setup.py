@@ -0,0 +1,27 @@
+"""
+Optional mypyc build for the pure-Python helper modules.
+
+    pip install -r requirements-dev.txt
+    python setup.py build_ext --inplace
+
+Without mypy installed the modules are packaged as plain Python.
+
+agent.py and app.py are deliberately left interpreted: livekit's function_tool
+and FastAPI both introspect function signatures at runtime, and VoiceAgent
+subclasses an interpreted livekit class.
+"""
+
+from setuptools import setup
+
+try:
+    from mypyc.build import mypycify
+except ImportError:
+    mypycify = None
+
+COMPILED_MODULES = ["faq_answers.py"]
+
+setup(
+    name="granteri-voice-agent",
+    py_modules=["faq_answers"],
+    ext_modules=mypycify(COMPILED_MODULES) if mypycify else [],
+)
@@ -1,8 +1,17 @@
-from vapi import Vapi
+from vapi_client import call_with_backoff, get_client, get_async_client
+import asyncio
+import hashlib
+import logging
 import os
+import secrets
+from pathlib import Path
+import orjson
 from dotenv import load_dotenv
 load_dotenv()
-client = Vapi(token=os.getenv("VAPI_TOKEN"))
+logger = logging.getLogger(__name__)
+
+# Assistant ids we have already created, keyed by a hash of their configuration
+_ASSISTANT_CACHE_PATH = Path(os.getenv("VAPI_ASSISTANT_CACHE", ".vapi_assistant.json"))
 
 "defining the system prompt"
 
@@ -13,40 +22,168 @@ system_prompt = """You are Alex, a customer service voice assistant for TechSolu
 - Demonstrate genuine concern for customer issues"""
 
 
+# Request payload pieces, built once rather than on every create call
+_MODEL_CFG = {
+    "provider": "openai",
+    "model": "gpt-4o",
+    "messages": [
+        {
+            "role": "system",
+            "content": system_prompt,
+        }
+    ],
+}
+_VOICE_CFG = {
+    "provider": "playht",
+    "voice_id": "jennifer",
+}
+_ASSISTANT_CONFIG = dict(
+    name="Customer Support Assistant",
+    model=_MODEL_CFG,
+    voice=_VOICE_CFG,
+    first_message="Hi there, this is Alex from OpenCode customer support. How can I help you today?",
+)
+# The configuration is fixed per deployment, so its cache key is computed once
+_ASSISTANT_KEY = hashlib.sha256(orjson.dumps(_ASSISTANT_CONFIG, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+# With REDIS_URL set, the id is shared by every process through these keys
+_REDIS_KEY = f"vapi:assistant:{_ASSISTANT_KEY}"
+_REDIS_LOCK_KEY = f"{_REDIS_KEY}:lock"
+# Seconds a creator may hold the lock before another process takes over
+_REDIS_LOCK_TTL = 30
+# Release the creation lock only if it still holds our token; after the TTL it may belong to another process
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _load_cache() -> dict:
+    try:
+        return orjson.loads(_ASSISTANT_CACHE_PATH.read_bytes())
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache: dict):
+    tmp = _ASSISTANT_CACHE_PATH.with_suffix(".tmp")
+    tmp.write_bytes(orjson.dumps(cache))
+    tmp.replace(_ASSISTANT_CACHE_PATH)
+
+
+def _cached_assistant(assistant_id: str):
+    """The previously created assistant, or None if Vapi no longer has it"""
+    from vapi.core.api_error import ApiError
+    
+    try:
+        return get_client().assistants.get(assistant_id)
+    except ApiError as error:
+        if error.status_code == 404:
+            return None
+        raise
+
+
+async def _acached_assistant(assistant_id: str):
+    """Async counterpart of _cached_assistant"""
+    from vapi.core.api_error import ApiError
+    
+    try:
+        return await call_with_backoff(get_async_client().assistants.get, assistant_id)
+    except ApiError as error:
+        if error.status_code == 404:
+            return None
+        raise
+
+
 def create_support_assistant():
+    """Return the support assistant, creating it only if this configuration has none yet"""
     try:
-        assistant = client.assistants.create(
-            name="Customer Support Assistant",
-            # Configure the AI model
-            model={
-                "provider": "openai",
-                "model": "gpt-4o",
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": system_prompt,
-                    }
-                ],
-            },
-            # Configure the voice
-            voice={
-                "provider": "playht",
-                "voice_id": "jennifer",
-            },
-            # Set the first message
-            first_message="Hi there, this is Alex from OpenCode customer support. How can I help you today?",
-        )
+        key = _ASSISTANT_KEY
+        cache = _load_cache()
+        if key in cache:
+            assistant = _cached_assistant(cache[key])
+            if assistant is not None:
+                logger.info("Reusing assistant: %s", assistant.id)
+                return assistant
         
-        print(f"Assistant created: {assistant.id}")
+        assistant = get_client().assistants.create(**_ASSISTANT_CONFIG)
+        cache[key] = assistant.id
+        _save_cache(cache)
+        
+        logger.info("Assistant created: %s", assistant.id)
         return assistant
     except Exception as error:
-        print(f"Error creating assistant: {error}")
+        logger.error("Error creating assistant: %s", error)
         raise error
-    
 
 
+async def _ashared_assistant(redis_url: str):
+    """
+    Resolve the assistant through Redis: reuse the stored id, otherwise let
+    exactly one process create it (SET NX lock) while the others wait for the id
+    """
+    import redis.asyncio as redis
+    
+    r = redis.Redis.from_url(redis_url)
+    release_lock = r.register_script(_RELEASE_LOCK_SCRIPT)
+    token = secrets.token_hex(16)
+    try:
+        for _ in range(_REDIS_LOCK_TTL * 4):
+            assistant_id = await r.get(_REDIS_KEY)
+            if assistant_id:
+                assistant = await _acached_assistant(assistant_id.decode())
+                if assistant is not None:
+                    logger.info("Reusing assistant: %s", assistant.id)
+                    return assistant
+                # Deleted on Vapi's side, drop the stale id and recreate
+                await r.delete(_REDIS_KEY)
+                continue
+            
+            if await r.set(_REDIS_LOCK_KEY, token, nx=True, ex=_REDIS_LOCK_TTL):
+                try:
+                    assistant = await call_with_backoff(get_async_client().assistants.create, **_ASSISTANT_CONFIG)
+                    await r.set(_REDIS_KEY, assistant.id)
+                finally:
+                    await release_lock(keys=[_REDIS_LOCK_KEY], args=[token])
+                logger.info("Assistant created: %s", assistant.id)
+                return assistant
+            
+            # Another process is creating it
+            await asyncio.sleep(0.25)
+        raise TimeoutError("Timed out waiting for another process to create the assistant")
+    finally:
+        await r.aclose()
+
 
+async def acreate_support_assistant():
+    """create_support_assistant over the async client, for use inside the event loop"""
+    try:
+        redis_url = os.getenv("REDIS_URL")
+        if redis_url:
+            return await _ashared_assistant(redis_url)
+        
+        key = _ASSISTANT_KEY
+        cache = _load_cache()
+        if key in cache:
+            assistant = await _acached_assistant(cache[key])
+            if assistant is not None:
+                logger.info("Reusing assistant: %s", assistant.id)
+                return assistant
+        
+        assistant = await call_with_backoff(get_async_client().assistants.create, **_ASSISTANT_CONFIG)
+        cache[key] = assistant.id
+        _save_cache(cache)
+        
+        logger.info("Assistant created: %s", assistant.id)
+        return assistant
+    except Exception as error:
+        logger.error("Error creating assistant: %s", error)
+        raise error
 
-# Create the assistant
-create_support_assistant()
 
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    # Create the assistant
+    create_support_assistant()
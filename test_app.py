@@ -0,0 +1,46 @@
+"""Tests for the webhook endpoint in app, run with: python -m unittest test_app"""
+
+import unittest
+from unittest import mock
+
+import orjson
+from fastapi.testclient import TestClient
+
+import app
+
+STARTED = {"type": "call.started", "call": {"id": "vapi-1", "customer": {"number": "+1555"}}}
+
+
+class InboundWebhookTest(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app.app)
+
+    def test_oversized_body_is_rejected(self):
+        body = orjson.dumps({**STARTED, "padding": "x" * 64})
+        with mock.patch("app.MAX_WEBHOOK_BYTES", 32):
+            response = self.client.post("/webhooks/inbound", content=body)
+        self.assertEqual(response.status_code, 413)
+
+    def test_oversized_chunked_body_is_rejected(self):
+        # No Content-Length, the limit is enforced while reading
+        def chunks():
+            for _ in range(8):
+                yield b"x" * 16
+
+        with mock.patch("app.MAX_WEBHOOK_BYTES", 32):
+            response = self.client.post("/webhooks/inbound", content=chunks())
+        self.assertEqual(response.status_code, 413)
+
+    def test_call_started_is_recorded(self):
+        response = self.client.post("/webhooks/inbound", content=orjson.dumps(STARTED))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, app._ACK_PROCESSED)
+
+    def test_missing_call_id_is_acknowledged(self):
+        response = self.client.post("/webhooks/inbound", content=orjson.dumps({"type": "call.started"}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, app._ACK_NO_CALL_ID)
+
+
+if __name__ == "__main__":
+    unittest.main()
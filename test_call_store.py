@@ -0,0 +1,143 @@
+"""Tests for call_store, run with: python -m unittest test_call_store"""
+
+import asyncio
+import unittest
+from unittest import mock
+
+from call_store import CallEventWriter, CallRecord, MemoryCallStore, RedisCallStore
+
+try:
+    import fakeredis
+    import lupa  # noqa: F401  fakeredis needs it to run Lua scripts
+except ImportError:
+    fakeredis = None
+
+
+class _StoreBehaviour:
+    """Shared cases, run against each store by the subclasses below"""
+
+    async def make_store(self):
+        raise NotImplementedError
+
+    async def asyncSetUp(self):
+        self.store = await self.make_store()
+        await self.store.create("ours", CallRecord(type="outbound", phone_number="+1555", status="queued"))
+
+    async def asyncTearDown(self):
+        await self.store.aclose()
+
+    async def test_update_if_status(self):
+        self.assertTrue(await self.store.update("ours", if_status="queued", status="initiated"))
+        self.assertFalse(await self.store.update("ours", if_status="queued", status="failed"))
+        self.assertEqual((await self.store.get("ours")).status, "initiated")
+
+    async def test_update_ignores_ended_and_unknown_calls(self):
+        await self.store.finish("ours")
+        self.assertFalse(await self.store.update("ours", status="initiated"))
+        self.assertFalse(await self.store.update("missing", status="initiated"))
+        self.assertIsNone(await self.store.get("missing"))
+
+    async def test_webhook_keeps_outbound_identity(self):
+        self.assertTrue(await self.store.record_webhook("ours", "unknown", "call.started", {"n": 1}))
+        record = await self.store.get("ours")
+        self.assertEqual((record.type, record.phone_number, record.status), ("outbound", "+1555", "call.started"))
+        self.assertEqual(await self.store.get_payload("ours"), {"n": 1})
+
+    async def test_inbound_call_start_creates_record(self):
+        self.assertTrue(await self.store.record_webhook("in", "+1666", "call.started", {}, create=True))
+        record = await self.store.get("in")
+        self.assertEqual((record.type, record.phone_number), ("inbound", "+1666"))
+        self.assertIn("in", await self.store.list_active())
+
+    async def test_unknown_call_is_not_created_without_create(self):
+        self.assertFalse(await self.store.record_webhook("in", "+1666", "call.updated", {}))
+        self.assertIsNone(await self.store.get("in"))
+
+    async def test_late_webhook_after_end_is_ignored(self):
+        await self.store.finish("ours")
+        for create in (False, True):
+            self.assertFalse(await self.store.record_webhook("ours", "+1555", "call.updated", {}, create=create))
+        self.assertEqual(await self.store.count_active(), 0)
+        self.assertEqual((await self.store.get("ours")).type, "outbound")
+
+    async def test_late_webhook_after_delete_is_ignored(self):
+        self.assertTrue(await self.store.delete("ours"))
+        self.assertFalse(await self.store.delete("ours"))
+        self.assertFalse(await self.store.record_webhook("ours", "+1555", "call.updated", {}))
+        self.assertIsNone(await self.store.get("ours"))
+        self.assertEqual(await self.store.count_active(), 0)
+
+
+class MemoryCallStoreTest(_StoreBehaviour, unittest.IsolatedAsyncioTestCase):
+    async def make_store(self):
+        return MemoryCallStore()
+
+
+@unittest.skipUnless(fakeredis, "fakeredis and lupa are required")
+class RedisCallStoreTest(_StoreBehaviour, unittest.IsolatedAsyncioTestCase):
+    async def make_store(self):
+        self.redis = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer())
+        with mock.patch("redis.asyncio.Redis.from_url", return_value=self.redis):
+            return RedisCallStore("redis://test")
+
+    async def test_update_keeps_active_ttl(self):
+        await self.store.update("ours", status="initiated")
+        self.assertGreater(await self.redis.ttl("call:ours"), 300)
+        await self.store.finish("ours")
+        self.assertLessEqual(await self.redis.ttl("call:ours"), 300)
+
+    async def test_update_does_not_recreate_expired_hash(self):
+        # Hash gone by TTL while the id still sits in the active set
+        await self.redis.delete("call:ours")
+        self.assertFalse(await self.store.update("ours", status="initiated"))
+        self.assertFalse(await self.redis.exists("call:ours"))
+
+
+class _SlowStore:
+    def __init__(self, delay):
+        self.delay = delay
+        self.applied = []
+
+    async def record_webhook(self, call_id, phone_number, status, payload, *, create=False):
+        await asyncio.sleep(self.delay)
+        self.applied.append((call_id, status))
+        return True
+
+    async def finish(self, call_id):
+        self.applied.append((call_id, "finished"))
+
+
+class CallEventWriterTest(unittest.IsolatedAsyncioTestCase):
+    async def test_events_applied_in_order_and_drained_on_close(self):
+        store = _SlowStore(0.01)
+        writer = CallEventWriter(store)
+        writer.start()
+        await writer.emit("a", "+1", "call.started", {}, terminal=False, create=True)
+        await writer.emit("a", "+1", "call.ended", {}, terminal=True, create=False)
+        await writer.aclose()
+        self.assertEqual(store.applied, [("a", "call.started"), ("a", "call.ended"), ("a", "finished")])
+
+    async def test_close_gives_up_after_timeout(self):
+        store = _SlowStore(10)
+        writer = CallEventWriter(store)
+        writer.start()
+        await writer.emit("a", "+1", "call.started", {}, terminal=False, create=True)
+        # Returns once the timeout passes instead of waiting on the stuck event
+        await asyncio.wait_for(writer.aclose(timeout=0.05), 1)
+        self.assertEqual(store.applied, [])
+        self.assertIsNone(writer._task)
+
+    async def test_unstarted_writer_applies_inline(self):
+        store = MemoryCallStore()
+        writer = CallEventWriter(store)
+        await writer.emit("in", "+1", "call.started", {}, terminal=False, create=True)
+        await writer.emit("in", "+1", "call.ended", {}, terminal=True, create=False)
+        self.assertEqual(await store.count_active(), 0)
+        self.assertEqual((await store.get("in")).status, "call.ended")
+        # A late update after the end doesn't bring the call back
+        await writer.emit("in", "+1", "call.updated", {}, terminal=False, create=False)
+        self.assertEqual((await store.get("in")).status, "call.ended")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+"""Tests for faq_answers, run with: python -m unittest test_faq_answers"""
+
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from faq_answers import FaqAnswers, load_faq, pending_utterance
+
+ANSWERS = {
+    "what are your opening hours": "We're open 9 to 5.",
+    "where are you located": "123 Main Street.",
+}
+
+
+def _user(text):
+    return SimpleNamespace(type="message", role="user", text_content=text)
+
+
+def _assistant(text):
+    return SimpleNamespace(type="message", role="assistant", text_content=text)
+
+
+class PendingUtteranceTest(unittest.TestCase):
+    def test_last_user_message(self):
+        items = [_user("hello"), _assistant("hi"), _user("where are you located")]
+        self.assertEqual(pending_utterance(items), "where are you located")
+
+    def test_after_tool_pass_is_not_answered(self):
+        # Second llm_node pass: the tool call and its output follow the user turn
+        items = [
+            _user("where are you located"),
+            SimpleNamespace(type="function_call", name="look_up_availability"),
+            SimpleNamespace(type="function_call_output", output="{}"),
+        ]
+        self.assertIsNone(pending_utterance(items))
+
+    def test_tool_items_before_the_user_turn_are_ignored(self):
+        items = [
+            _user("check tuesday"),
+            SimpleNamespace(type="function_call", name="look_up_availability"),
+            SimpleNamespace(type="function_call_output", output="{}"),
+            _assistant("Tuesday has 9am"),
+            _user("where are you located"),
+        ]
+        self.assertEqual(pending_utterance(items), "where are you located")
+
+
+class FaqAnswersTest(unittest.TestCase):
+    def test_configured_answer_matches_with_small_differences(self):
+        faq = FaqAnswers(ANSWERS)
+        self.assertEqual(faq.match("What are you opening hours?"), "We're open 9 to 5.")
+
+    def test_other_questions_are_not_answered(self):
+        faq = FaqAnswers(ANSWERS)
+        self.assertIsNone(faq.match("can I speak to someone about my bill"))
+
+    def test_days_and_numbers_never_match(self):
+        faq = FaqAnswers({**ANSWERS, "what times do you have on tuesday": "Tuesday: 9am, 11am"})
+        self.assertIsNone(faq.match("what times do you have on tuesday"))
+        self.assertIsNone(faq.match("what times do you have on thursday"))
+        self.assertIsNone(faq.match("what are your opening hours on 12th"))
+
+    def test_load_faq(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "faq.json")
+            self.assertEqual(load_faq(path), {})
+            with open(path, "w") as f:
+                f.write('{"where are you located": "123 Main Street."}')
+            self.assertEqual(load_faq(path), {"where are you located": "123 Main Street."})
+
+
+if __name__ == "__main__":
+    unittest.main()
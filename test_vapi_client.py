@@ -0,0 +1,88 @@
+"""Tests for vapi_client's retry loop, run with: python -m unittest test_vapi_client"""
+
+import unittest
+from unittest import mock
+
+import vapi_client
+from vapi_client import MAX_ATTEMPTS, MAX_RETRY_AFTER, call_with_backoff
+
+
+class FakeApiError(Exception):
+    """Stands in for vapi.core.api_error.ApiError"""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(status_code)
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class FlakyCall:
+    """Raises the given errors in turn, then returns "ok" """
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+class CallWithBackoffTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        # The semaphore is built lazily per event loop
+        vapi_client._inflight = None
+        patcher = mock.patch("vapi_client.asyncio.sleep", new_callable=mock.AsyncMock)
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def delays(self):
+        return [call.args[0] for call in self.sleep.await_args_list]
+
+    async def test_retry_after_is_honored(self):
+        fn = FlakyCall(FakeApiError(429, {"retry-after": "2"}))
+        self.assertEqual(await call_with_backoff(fn), "ok")
+        self.assertEqual(fn.calls, 2)
+        (delay,) = self.delays()
+        self.assertTrue(2 <= delay <= 2.25, delay)
+
+    async def test_retry_after_is_capped(self):
+        fn = FlakyCall(FakeApiError(429, {"Retry-After": "3600"}))
+        self.assertEqual(await call_with_backoff(fn), "ok")
+        (delay,) = self.delays()
+        self.assertTrue(MAX_RETRY_AFTER <= delay <= MAX_RETRY_AFTER + 0.25, delay)
+
+    async def test_full_jitter_without_retry_after(self):
+        fn = FlakyCall(*(FakeApiError(429) for _ in range(MAX_ATTEMPTS - 1)))
+        self.assertEqual(await call_with_backoff(fn), "ok")
+        delays = self.delays()
+        self.assertEqual(len(delays), MAX_ATTEMPTS - 1)
+        for attempt, delay in enumerate(delays):
+            self.assertTrue(0 <= delay <= min(0.5 * 2 ** attempt, 10.0), (attempt, delay))
+
+    async def test_gives_up_after_max_attempts(self):
+        fn = FlakyCall(*(FakeApiError(429) for _ in range(MAX_ATTEMPTS)))
+        with self.assertRaises(FakeApiError):
+            await call_with_backoff(fn)
+        self.assertEqual(fn.calls, MAX_ATTEMPTS)
+        self.assertEqual(len(self.delays()), MAX_ATTEMPTS - 1)
+
+    async def test_other_errors_are_not_retried(self):
+        for error in (FakeApiError(500), ValueError("bad request")):
+            fn = FlakyCall(error)
+            with self.assertRaises(type(error)):
+                await call_with_backoff(fn)
+            self.assertEqual(fn.calls, 1)
+        self.sleep.assert_not_awaited()
+
+    async def test_limiter_is_acquired_per_attempt(self):
+        limiter = mock.Mock(acquire=mock.AsyncMock())
+        fn = FlakyCall(FakeApiError(429))
+        self.assertEqual(await call_with_backoff(fn, limiter=limiter), "ok")
+        self.assertEqual(limiter.acquire.await_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
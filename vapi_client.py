@@ -0,0 +1,114 @@
+"""
+Shared Vapi clients.
+Every module talks to Vapi through these instances so TCP/TLS connections are
+pooled and reused across requests instead of being opened per call.
+The SDK is only imported, and the clients only built, on first use.
+"""
+
+import asyncio
+import os
+import random
+from typing import Optional
+
+from config import VAPI_TOKEN
+
+# Upper bound on async Vapi requests in flight from this process
+VAPI_MAX_INFLIGHT = int(os.getenv("VAPI_MAX_INFLIGHT", "16"))
+MAX_ATTEMPTS = 5
+# Longest Retry-After honored, a misbehaving header can't park a request for minutes
+MAX_RETRY_AFTER = 30.0
+
+_client = None
+_async_client = None
+# The pooled httpx clients behind the Vapi clients, kept for shutdown
+_http = None
+_async_http = None
+# Built with the async client, not at import, so it belongs to the loop that uses it
+_inflight: Optional[asyncio.Semaphore] = None
+
+
+def _limits():
+    import httpx
+
+    # Keep-alive pool shared by all requests made through a client
+    return httpx.Limits(max_keepalive_connections=20, max_connections=50)
+
+
+def get_client():
+    """Process-wide synchronous Vapi client"""
+    global _client, _http
+    if _client is None:
+        import httpx
+        from vapi import Vapi
+
+        _http = httpx.Client(limits=_limits(), http2=True)
+        _client = Vapi(token=VAPI_TOKEN, httpx_client=_http)
+    return _client
+
+
+def _inflight_slots() -> asyncio.Semaphore:
+    """Semaphore capping this process's async Vapi requests, created on first use"""
+    global _inflight
+    if _inflight is None:
+        _inflight = asyncio.Semaphore(VAPI_MAX_INFLIGHT)
+    return _inflight
+
+
+def get_async_client():
+    """Process-wide asynchronous Vapi client"""
+    global _async_client, _async_http
+    if _async_client is None:
+        import httpx
+        from vapi import AsyncVapi
+
+        _async_http = httpx.AsyncClient(limits=_limits(), http2=True)
+        _async_client = AsyncVapi(token=VAPI_TOKEN, httpx_client=_async_http)
+    return _async_client
+
+
+def _retry_after(error) -> Optional[float]:
+    """Seconds the API asked us to wait, if it sent a Retry-After header"""
+    headers = getattr(error, "headers", None) or {}
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+async def call_with_backoff(fn, *args, limiter=None, **kwargs):
+    """
+    Await an async Vapi SDK call under the in-flight cap, backing off and
+    retrying when Vapi answers 429. An optional aiolimiter.AsyncLimiter is
+    waited on before each attempt takes an in-flight slot.
+    """
+    for attempt in range(MAX_ATTEMPTS):
+        if limiter is not None:
+            # Rate-limited callers wait here, without holding a slot other requests need
+            await limiter.acquire()
+        async with _inflight_slots():
+            try:
+                return await fn(*args, **kwargs)
+            except Exception as error:
+                # The SDK's ApiError carries status_code, anything else is re-raised as is
+                if getattr(error, "status_code", None) != 429 or attempt == MAX_ATTEMPTS - 1:
+                    raise
+                retry_after = _retry_after(error)
+
+        # Sleep outside the semaphore so waiting retries don't hold a slot
+        if retry_after is not None:
+            delay = min(retry_after, MAX_RETRY_AFTER) + random.uniform(0, 0.25)
+        else:
+            # Exponential backoff with full jitter
+            delay = random.uniform(0, min(0.5 * 2 ** attempt, 10.0))
+        await asyncio.sleep(delay)
+
+
+async def aclose():
+    """Close the pooled connections, call on application shutdown"""
+    global _client, _async_client, _http, _async_http, _inflight
+    if _async_http is not None:
+        await _async_http.aclose()
+    if _http is not None:
+        _http.close()
+    _client = _async_client = _http = _async_http = _inflight = None